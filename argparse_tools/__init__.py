@@ -1,6 +1,27 @@
+import abc
 import argparse
+import bisect
+import collections
+import copy
 import functools
+import importlib
+import operator
 import os
+import sys
+import threading
+from collections.abc import Mapping
+
+
+# Namespace attribute that module-path subcommands use to record the module
+# whose main(ns) should handle them.  See `add_subparsers` and `dispatch`
+MAIN_DEST = '_subcommand_main'
+
+# the argparse_tools.instrument.Instrumentation that is recording, if any
+_instrumentation = None
+
+# while `_raising.active` is True, ArgumentParsers in the current thread raise
+# ParseError instead of printing and exiting.  See argparse_tools.batch
+_raising = threading.local()
 
 
 class TooManyDefaultsDefined(Exception):
@@ -11,6 +32,164 @@ class EnvironmentVarRequired(Exception):
     pass
 
 
+class EnvironmentVarInvalid(Exception):
+    pass
+
+
+class ParseError(Exception):
+    """An invalid command-line.
+
+    `message` - what was wrong, as argparse would report it
+    `argument` - None or the option string / dest of the offending argument
+    `argv` - None or the list of command-line arguments that were parsed
+    """
+    def __init__(self, message, argument=None, argv=None):
+        super(ParseError, self).__init__(message)
+        self.message = message
+        self.argument = argument
+        self.argv = argv
+
+    def __reduce__(self):
+        return (ParseError, (self.message, self.argument, self.argv))
+
+
+def parse_bool(string):
+    """Convert strings like "true", "yes", "1", "false", "no", "0" or "" to
+    a bool"""
+    val = string.strip().lower()
+    if val in ('1', 'true', 't', 'yes', 'y', 'on'):
+        return True
+    elif val in ('0', 'false', 'f', 'no', 'n', 'off', ''):
+        return False
+    raise argparse.ArgumentTypeError("invalid boolean value: %r" % string)
+
+
+def _has_side_effects(type_func):
+    """Whether calling an argument's type opens files or the like"""
+    return isinstance(type_func, argparse.FileType) or type_func is open
+
+
+def _takes_many(nargs):
+    """Whether an argument with this nargs takes a list of values"""
+    return nargs in ('*', '+', argparse.REMAINDER) or isinstance(nargs, int)
+
+
+def _check_default_type(kwargs):
+    """Raise ValueError for arguments whose defaults, read from the
+    environment or a config file, argparse would never convert"""
+    if _has_side_effects(kwargs.get('type')) \
+            and _takes_many(kwargs.get('nargs')):
+        raise ValueError(
+            "%s: argparse doesn't call type=%r on list defaults, so a"
+            " default read from the environment or a config file would"
+            " never be opened.  Use nargs=None or '?'"
+            % (kwargs['dest'], kwargs['type']))
+
+
+def _coerce_env_value(key, value, kwargs, delimiter):
+    """Convert the string value of environment variable `key` using the
+    type, choices and nargs that add_argument received in `kwargs`.
+
+    Types with side effects, like argparse.FileType, aren't called: the
+    value is left as a string, which argparse converts when parsing, and
+    only if the option isn't given.  A value that the type converts to a
+    string is also left as it is, since argparse converts string defaults
+    again.
+
+    Raise EnvironmentVarInvalid if the value is not valid for the argument
+    """
+    if _takes_many(kwargs.get('nargs')):
+        values = [v.strip() for v in value.split(delimiter)] if value else []
+    else:
+        values = [value]
+    return _coerce_values(key, value, values, kwargs)
+
+
+def _coerce_values(key, value, values, kwargs):
+    """Convert the list of `values`, read from `value`, with the type of the
+    argument, and check their number and choices.  Values that aren't
+    strings are converted from their str(), like a command-line would be,
+    so they become strings if the argument has no type.  See
+    _coerce_env_value.
+
+    Return the list of values, or the only value if the argument doesn't
+    take a list.  Raise EnvironmentVarInvalid if a value is invalid
+    """
+    nargs = kwargs.get('nargs')
+    if nargs == '+' and not values:
+        raise EnvironmentVarInvalid(
+            "%s=%r: expected at least one value" % (key, value))
+    if isinstance(nargs, int) and len(values) != nargs:
+        raise EnvironmentVarInvalid("%s=%r: expected %s values" % (
+            key, value, nargs))
+    type_func = kwargs.get('type')
+    if _has_side_effects(type_func):
+        return values[0]
+    converted = [str(v) for v in values]
+    if callable(type_func):
+        try:
+            converted = [type_func(str(v)) for v in values]
+        except (TypeError, ValueError, argparse.ArgumentTypeError) as err:
+            raise EnvironmentVarInvalid("%s=%r: %s" % (key, value, err))
+    choices = kwargs.get('choices')
+    if choices is not None:
+        for v in converted:
+            if v not in choices:
+                raise EnvironmentVarInvalid(
+                    "%s=%r: invalid choice: %r (choose from %s)" % (
+                        key, value, v, ', '.join(map(repr, choices))))
+    if _takes_many(nargs):
+        return converted
+    elif isinstance(converted[0], str):
+        # argparse calls the type on string defaults when parsing
+        return str(values[0])
+    return converted[0]
+
+
+class EnvSnapshot(Mapping):
+    """A read-only copy of the environment variables, taken once, that can be
+    shared by many DefaultFromEnv actions
+
+        env = EnvSnapshot(prefix='MYAPP_')
+        add_argument("--optA", action=DefaultFromEnv, env_prefix='myapp_',
+                     env=env)
+
+    `environ` - None (use os.environ) or a dict of environment variables
+    `prefix` - if given, only keep the variables whose name starts with
+               prefix.upper()
+    """
+    def __init__(self, environ=None, prefix=""):
+        self._from_os = environ is None
+        if environ is None:
+            environ = os.environ
+        self.prefix = prefix.upper()
+        self._vars = dict(
+            (k, v) for k, v in environ.items() if k.startswith(self.prefix))
+
+    def __getitem__(self, key):
+        return self._vars[key]
+
+    def __contains__(self, key):
+        return key in self._vars
+
+    def __iter__(self):
+        return iter(self._vars)
+
+    def __len__(self):
+        return len(self._vars)
+
+    def __repr__(self):
+        if self._from_os:
+            return "EnvSnapshot(prefix=%r)" % self.prefix
+        return "EnvSnapshot(%r, prefix=%r)" % (self._vars, self.prefix)
+
+    def __reduce__(self):
+        # a snapshot of os.environ is taken again when unpickled
+        if self._from_os:
+            return (EnvSnapshot, (None, self.prefix))
+        return (EnvSnapshot, (self._vars, self.prefix))
+
+
 class DefaultFromEnv(argparse.Action):
     """Define argument options that fetch defaults from environment variables
 
@@ -30,33 +209,65 @@ class DefaultFromEnv(argparse.Action):
                      default=1)
             --> both fail if OPTD is not an environment variable
             --> hardcoded 'default=...' is always ignored
+
+        add_argument("--optE", action=DefaultFromEnv, env={'OPTE': '1'})
+            --> looks up OPTE in the given mapping (ie an EnvSnapshot)
+                rather than in os.environ
+
+        add_argument("--optF", action=DefaultFromEnv, type=int, nargs='+',
+                     choices=[1, 2, 3])
+            --> converts an env var like OPTF="1,3" to [1, 3] when the parser
+                is built, and raises EnvironmentVarInvalid if the env var
+                isn't valid.  `env_delimiter` separates the values.  Types
+                with side effects, like argparse.FileType, are left for
+                argparse to call when parsing, so they can't take a list
+                (ValueError)
     """
-    def __init__(self, env_prefix="", envrequired=False, **kwargs):
+    def __init__(self, env_prefix="", envrequired=False, env=None,
+                 env_delimiter=",", **kwargs):
+        # so that argparse_tools.cache can read the default again
+        init_kwargs = dict(
+            kwargs, env_prefix=env_prefix, envrequired=envrequired, env=env,
+            env_delimiter=env_delimiter)
         kwargs = kwargs.copy()
+        _check_default_type(kwargs)
+        if env is None:
+            env = os.environ
         key = ("%s%s" % (env_prefix, kwargs['dest'])).upper()
-        if key in os.environ:
-            if 'default' in kwargs:
-                # the environment default overrides the code default
-                pass
+        if _instrumentation is None:
+            value = env.get(key)
+        else:
+            value = _instrumentation.record('env', key, env.get, key)
+        if value is not None:
+            # the environment default overrides the code default
+            kwargs['default'] = _coerce_env_value(
+                key, value, kwargs, env_delimiter)
             if kwargs.get('required'):
                 kwargs['required'] = False
         elif envrequired:
             raise EnvironmentVarRequired(key)
-        kwargs['default'] = os.getenv(key, kwargs.get('default'))
+        else:
+            kwargs['default'] = kwargs.get('default')
         kwargs['metavar'] = "%s%s" % (
             env_prefix, kwargs.get('metavar') or kwargs['dest'].upper())
         super(DefaultFromEnv, self).__init__(**kwargs)
+        # the env var that the default was read from
+        self.env_key = key
+        self._init_kwargs = init_kwargs
 
     def __call__(self, parser, namespace, values, option_string=None):
         setattr(namespace, self.dest, values)
 
 
-def add_argument_default_from_env_factory(env_prefix=""):
+def add_argument_default_from_env_factory(env_prefix="", env=None):
     """Return an add_argument(...) function that gets defaults from an
     environment variable (using the DefaultFromEnv action), but also lets
     users use some specifically supported actions like
     'store_true' and 'store_false'
 
+    `env` - None (read os.environ) or a mapping, like an EnvSnapshot, that
+            every argument added by the returned function reads from
+
     >>> add_argument = add_argument_default_from_env_factory("PREFIX_")
     >>> p = build_arg_parser([\
         add_argument('--blah', action='store_true'),\
@@ -82,15 +293,18 @@ def add_argument_default_from_env_factory(env_prefix=""):
 
         Use as you would add_argument, but be warned that most actions will
         not work.  Acceptable actions are 'store_true' and 'store_false'.
+        Their env vars are parsed with parse_bool.
         """
         if 'action' in kwargs:
             val = kwargs.pop('action')
             if val == 'store_true':
                 kwargs['const'] = True
                 kwargs['nargs'] = '?'
+                kwargs.setdefault('type', parse_bool)
             elif val == 'store_false':
                 kwargs['const'] = False
                 kwargs['nargs'] = '?'
+                kwargs.setdefault('type', parse_bool)
             else:
                 raise NotImplemented(
                     "Not sure how to deal with this argparse argument option."
@@ -98,6 +312,8 @@ def add_argument_default_from_env_factory(env_prefix=""):
                     " from"
                     " the environment.  You cannot specify action=%s for the"
                     " argument identified by: %s" % (val, str(args[:2])))
+        if env is not None:
+            kwargs.setdefault('env', env)
         return add_argument(
             *args, action=DefaultFromEnv, env_prefix=env_prefix, **kwargs)
     return _add_argument
@@ -119,15 +335,205 @@ def lazy_kwargs(f):
     return _lazy_kwargs
 
 
+def _apply(func, parser):
+    """Call func(parser), recording it if instrumentation is enabled"""
+    if _instrumentation is None:
+        func(parser)
+    else:
+        _instrumentation.record_func(func, parser)
+
+
+def _hashable(obj, typed=False):
+    """Return a hashable version of obj, converting lists, dicts and sets.
+
+    If `typed`, values that compare equal but have different types, like 1,
+    1.0 and True, or [1] and (1, ), stay different
+    """
+    if isinstance(obj, (list, tuple)):
+        rv = tuple(_hashable(x, typed) for x in obj)
+    elif isinstance(obj, dict):
+        rv = tuple(sorted(
+            ((_hashable(k, typed), _hashable(v, typed))
+             for k, v in obj.items()),
+            key=repr))
+    elif isinstance(obj, (set, frozenset)):
+        rv = frozenset(_hashable(x, typed) for x in obj)
+    else:
+        rv = obj
+    if typed and not isinstance(obj, Spec):
+        return (type(obj), rv)
+    return rv
+
+
+def _as_dict(obj):
+    if isinstance(obj, Spec):
+        return obj.as_dict()
+    elif isinstance(obj, (list, tuple)):
+        return [_as_dict(x) for x in obj]
+    elif isinstance(obj, dict):
+        return dict((k, _as_dict(v)) for k, v in obj.items())
+    elif callable(obj):
+        return repr(obj)
+    return obj
+
+
+class Spec(object, metaclass=abc.ABCMeta):
+    """Base class of the declarative specs returned by add_argument, group,
+    mutually_exclusive and add_subparsers.
+
+    A spec is called with a parser to add itself to the parser, just like
+    any other func passed to build_arg_parser.  Specs can also be inspected
+    without building a parser: they compare equal and hash the same if they
+    declare the same thing, and `walk()` iterates over a tree of specs.
+    """
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def __call__(self, parser):
+        """Add the spec to the parser"""
+
+    @abc.abstractmethod
+    def _key(self):
+        """Return what the spec declares, for comparing and hashing"""
+
+    @property
+    def children(self):
+        """The funcs (specs or plain functions) this spec contains"""
+        return ()
+
+    def walk(self):
+        """Iterate over this spec and all the specs it contains, depth first
+        """
+        yield self
+        for child in self.children:
+            if isinstance(child, Spec):
+                for spec in child.walk():
+                    yield spec
+
+    @abc.abstractmethod
+    def as_dict(self):
+        """Return the spec as plain python data.  Funcs that aren't specs
+        are represented by their repr"""
+
+    def __eq__(self, other):
+        return type(self) is type(other) \
+            and _hashable(self._key(), True) == _hashable(other._key(), True)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self).__name__, _hashable(self._key(), True)))
+
+
+class ArgumentSpec(Spec):
+    """A single argument.  See add_argument"""
+    __slots__ = ('args', 'kwargs')
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self, parser):
+        parser.add_argument(*self.args, **self.kwargs)
+
+    def _key(self):
+        return (self.args, self.kwargs)
+
+    def __reduce__(self):
+        return (ArgumentSpec, (self.args, self.kwargs))
+
+    @property
+    def option_strings(self):
+        return [arg for arg in self.args if arg[:1] == '-']
+
+    @property
+    def dest(self):
+        """The dest that argparse will give this argument, assuming the
+        parser's prefix_chars is '-'"""
+        if 'dest' in self.kwargs:
+            return self.kwargs['dest']
+        option_strings = self.option_strings
+        if not option_strings:
+            return self.args[0]
+        long_options = [o for o in option_strings if o[:2] == '--']
+        return (long_options or option_strings)[0].lstrip('-').replace(
+            '-', '_')
+
+    @property
+    def name(self):
+        return 'add_argument(%s)' % ', '.join(repr(a) for a in self.args)
+
+    def as_dict(self):
+        return {'type': 'add_argument', 'args': list(self.args),
+                'kwargs': _as_dict(self.kwargs)}
+
+    def __repr__(self):
+        return 'add_argument(%s)' % ', '.join(
+            [repr(a) for a in self.args] +
+            ['%s=%r' % kv for kv in sorted(self.kwargs.items())])
+
+
+class GroupSpec(Spec):
+    """An argument group or mutually exclusive group.  See group"""
+    __slots__ = ('description', 'funcs', 'kwargs')
+
+    def __init__(self, description, funcs, kwargs):
+        self.description = description
+        self.funcs = funcs
+        self.kwargs = kwargs
+
+    def __call__(self, parser):
+        kwargs = dict(self.kwargs)
+        if kwargs.pop('mutually_exclusive', False):
+            g = parser.add_mutually_exclusive_group(**kwargs)
+        elif kwargs:
+            raise UserWarning(
+                "Unrecognized kwargs: %s" % str(list(kwargs.keys())))
+        else:
+            g = parser.add_argument_group(self.description)
+        for f in self.funcs:
+            _apply(f, g)
+
+    def _key(self):
+        return (self.description, self.funcs, self.kwargs)
+
+    def __reduce__(self):
+        return (GroupSpec, (self.description, self.funcs, self.kwargs))
+
+    @property
+    def children(self):
+        return self.funcs
+
+    @property
+    def mutually_exclusive(self):
+        return bool(self.kwargs.get('mutually_exclusive'))
+
+    @property
+    def name(self):
+        if self.mutually_exclusive:
+            return 'mutually_exclusive()'
+        return 'group(%r)' % self.description
+
+    def as_dict(self):
+        return {'type': 'group', 'description': self.description,
+                'funcs': _as_dict(self.funcs), 'kwargs': dict(self.kwargs)}
+
+    def __repr__(self):
+        return 'group(%s)' % ', '.join(
+            [repr(self.description)] + [repr(f) for f in self.funcs] +
+            ['%s=%r' % kv for kv in sorted(self.kwargs.items())])
+
+
 def add_argument(*args, **kwargs):
     """wraps argparse.ArgumentParser.add_argument
     meant to be used like this:
 
         build_arg_parser([add_argument('blah')])
+
+    Return an ArgumentSpec, which adds the argument when called with a parser
     """
-    def _add_argument(parser):
-        parser.add_argument(*args, **kwargs)
-    return _add_argument
+    return ArgumentSpec(args, kwargs)
 
 
 def group(description, *funcs, **kwargs):
@@ -140,8 +546,8 @@ def group(description, *funcs, **kwargs):
     `mutually_exclusive` - (bool) if True, then
                            each func is mutually exclusive of the other funcs
 
-    Return a function that receives an argparse.ArgumentParser instance and
-    adds the group to it
+    Return a GroupSpec, which receives an argparse.ArgumentParser instance
+    and adds the group to it
 
     EXAMPLE:
 
@@ -163,18 +569,7 @@ def group(description, *funcs, **kwargs):
           --and_this AND_THIS
 
     """
-    def _argument_group(parser):
-        if kwargs.get('mutually_exclusive'):
-            kwargs.pop('mutually_exclusive')
-            g = parser.add_mutually_exclusive_group(**kwargs)
-        elif kwargs:
-            raise UserWarning(
-                "Unrecognized kwargs: %s" % str(list(kwargs.keys())))
-        else:
-            g = parser.add_argument_group(description)
-        for f in funcs:
-            f(g)
-    return _argument_group
+    return GroupSpec(description, funcs, kwargs)
 
 
 def mutually_exclusive(*funcs, **kwargs):
@@ -205,15 +600,390 @@ def mutually_exclusive(*funcs, **kwargs):
     return group(None, *funcs, mutually_exclusive=True, **kwargs)
 
 
-def add_subparsers(dct, **kwargs):
+class _SharedActions(object):
+    """The actions of a template, built once into a parser-like container
+    the first time the template is used"""
+    def __init__(self, funcs):
+        self.funcs = funcs
+        self._container = None
+        self._lock = threading.RLock()
+
+    def get(self):
+        with self._lock:
+            if self._container is None:
+                container = build_arg_parser(
+                    list(self.funcs), add_help=False)()
+                if container._subparsers is not None:
+                    raise ValueError("Templates can't contain subparsers")
+                self._container = container
+        return self._container
+
+    def __reduce__(self):
+        # an unpickled template is built again when first used
+        return (_SharedActions, (self.funcs, ))
+
+
+class TemplateSpec(Spec):
+    """A set of arguments that is built once and shared by many parsers.
+    See template"""
+    __slots__ = ('shared', 'overrides', '_substitutions')
+
+    def __init__(self, shared, overrides=()):
+        self.shared = shared
+        self.overrides = overrides
+        self._substitutions = None
+
+    @property
+    def funcs(self):
+        return self.shared.funcs
+
+    def _get_substitutions(self, container):
+        """Return a list of (shared action, modified copy) for the
+        overrides.  The copies are made once and shared too"""
+        if self._substitutions is None:
+            by_dest = dict((a.dest, a) for a in container._actions)
+            substitutions = []
+            for dest, changes in self.overrides:
+                action = copy.copy(by_dest[dest])
+                for name, value in changes:
+                    setattr(action, name, value)
+                substitutions.append((by_dest[dest], action))
+            self._substitutions = substitutions
+        return self._substitutions
+
+    def __call__(self, parser):
+        if not isinstance(parser, ArgumentParser):
+            # ie an argument group, or a stand-in for a parser
+            actions = getattr(parser, '_actions', None)
+            if not isinstance(actions, list):
+                actions = []
+            n_actions = len(actions)
+            for func in self.funcs:
+                _apply(func, parser)
+            new_actions = actions[n_actions:]
+            for dest, changes in self.overrides:
+                for action in new_actions:
+                    if action.dest == dest:
+                        for name, value in changes:
+                            setattr(action, name, value)
+            return
+        container = self.shared.get()
+        substitutions = self._get_substitutions(container)
+        parser._add_shared_actions(container)
+        for action, replacement in substitutions:
+            parser._replace_action(action, replacement)
+            parser._shared_actions.add(replacement)
+
+    def override(self, dest, **changes):
+        """Return a TemplateSpec that shares this template's arguments,
+        except that the argument with the given `dest` has the changed
+        attributes, ie .override('opt2', required=True)"""
+        if 'dest' in changes or 'option_strings' in changes:
+            raise ValueError("Can't override the dest or option strings")
+        if not any(isinstance(spec, ArgumentSpec) and spec.dest == dest
+                   for func in self.funcs if isinstance(func, Spec)
+                   for spec in func.walk()) \
+                and dest not in (a.dest for a in self.shared.get()._actions):
+            raise ValueError("Template has no argument with dest: %s" % dest)
+        return TemplateSpec(self.shared, self.overrides + (
+            (dest, tuple(sorted(changes.items()))), ))
+
+    def _key(self):
+        return (self.funcs, self.overrides)
+
+    def __reduce__(self):
+        return (TemplateSpec, (self.shared, self.overrides))
+
+    @property
+    def children(self):
+        return self.funcs
+
+    @property
+    def name(self):
+        return 'template()'
+
+    def as_dict(self):
+        return {'type': 'template', 'funcs': _as_dict(self.funcs),
+                'overrides': [
+                    {'dest': dest, 'changes': _as_dict(dict(changes))}
+                    for dest, changes in self.overrides]}
+
+    def __repr__(self):
+        return 'template(%s)%s' % (
+            ', '.join(repr(f) for f in self.funcs), ''.join(
+                '.override(%r%s)' % (dest, ''.join(
+                    ', %s=%r' % kv for kv in changes))
+                for dest, changes in self.overrides))
+
+
+def template(*funcs):
+    """
+    Define a set of arguments that many parsers or subparsers share, ie a
+    block of common options added to every subcommand of a large CLI.
+
+    The funcs are applied once, to a private parser, the first time the
+    template is used.  Every parser that uses the template then shares the
+    same argparse Action objects instead of building its own, so build time
+    and memory grow with the number of distinct options, not with options
+    times parsers.  A parser copies a shared action before modifying it,
+    ie in set_defaults.
+
+    Return a TemplateSpec.  Use .override(dest, **attributes) to change an
+    argument for some parsers only; the other arguments are still shared:
+
+        common = template(opt1, optgroup1, add_argument('--opt2'))
+        build_arg_parser([
+            add_subparsers({
+                'a': [common, add_argument('--in_a_only')],
+                'b': [common.override('opt2', required=True)]})
+        ])
+
+    Templates can't contain subparsers.  Applied to anything but an
+    argparse_tools.ArgumentParser, ie an argument group, a template simply
+    applies its funcs.
+    """
+    return TemplateSpec(_SharedActions(funcs))
+
+
+def _save_state(parser):
+    """Return a function that undoes any changes made to parser and its
+    groups since this call.  The lists, dicts and sets they refer to are
+    restored in place, since the groups share them with the parser"""
+    saved = []
+    for obj in [parser] + parser._action_groups \
+            + parser._mutually_exclusive_groups:
+        state = dict(vars(obj))
+        contents = [
+            (v, type(v)(v)) for v in state.values()
+            if type(v) in (list, dict, set)]
+        saved.append((obj, state, contents))
+
+    def restore():
+        for obj, state, contents in saved:
+            vars(obj).clear()
+            vars(obj).update(state)
+            for container, content in contents:
+                container.clear()
+                if isinstance(container, list):
+                    container.extend(content)
+                else:
+                    container.update(content)
+    return restore
+
+
+class _LazyParserMap(dict):
+    """A name -> subparser mapping for argparse's subparsers action.
+
+    Subparsers registered with `defer` are created empty, and their arguments
+    are only added the first time the subparser is looked up (ie when argparse
+    dispatches to it, or when something walks the subparsers explicitly).
+    Lookups from many threads build each subparser exactly once.  If the
+    build raises, the subparser is left empty and built again on the next
+    lookup.
+    """
+    def __init__(self, *args, **kwargs):
+        super(_LazyParserMap, self).__init__(*args, **kwargs)
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    def defer(self, name, build):
+        """Call build(subparser) the first time `name` is looked up"""
+        self._pending[name] = build
+
+    def __getitem__(self, name):
+        parser = dict.__getitem__(self, name)
+        if name in self._pending:
+            with self._lock:
+                # only remove the build once it's done, so other threads wait
+                build = self._pending.get(name)
+                if build is not None:
+                    restore = _save_state(parser)
+                    try:
+                        if _instrumentation is None:
+                            build(parser)
+                        else:
+                            _instrumentation.record(
+                                'subparser', name, build, parser)
+                    except BaseException:
+                        # don't leave a half-built parser behind
+                        restore()
+                        raise
+                self._pending.pop(name, None)
+        return parser
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def __reduce__(self):
+        # pickle the subparsers without building them.  The lock can't be
+        # pickled
+        return (_LazyParserMap, (dict(dict.items(self)), ),
+                {'_pending': self._pending})
+
+
+def _import_target(path):
+    """Import and return the object at a path like "pkg.module:attr" """
+    module_name, _, attr = path.partition(':')
+    obj = importlib.import_module(module_name)
+    for name in attr.split('.') if attr else []:
+        obj = getattr(obj, name)
+    return obj
+
+
+def _build_from_target(path, parser):
+    """Add the arguments defined at module-path `path` to the given parser.
+
+    The path may point to a list of funcs, a single func that accepts a
+    parser, or a closure returned by build_arg_parser(funcs)
+    """
+    target = _import_target(path)
+    if isinstance(target, (list, tuple)):
+        funcs = target
+    elif hasattr(target, 'funcs'):
+        funcs = target.funcs
+        if parser.description is None:
+            parser.description = target().description
+    else:
+        funcs = [target]
+    build_arg_parser(funcs, parser)
+
+
+def dispatch(ns):
+    """Call the main(ns) function of the module that defined the subcommand
+    chosen in `ns`, and return its result.
+
+    Only subcommands given as module paths to `add_subparsers` can be
+    dispatched.
+    """
+    target = getattr(ns, MAIN_DEST, None)
+    if target is None:
+        raise UserWarning(
+            "Cannot dispatch: the chosen subcommand was not defined by a"
+            " module path")
+    return _import_target(target)(ns)
+
+
+class SubparsersSpec(Spec):
+    """A set of subcommands.  See add_subparsers"""
+    __slots__ = ('dct', 'lazy', 'subcommand_help', 'kwargs', 'threads')
+
+    def __init__(self, dct, lazy, subcommand_help, kwargs, threads=None):
+        self.dct = dct
+        self.lazy = lazy
+        self.subcommand_help = subcommand_help
+        self.kwargs = kwargs
+        self.threads = threads
+
+    def __call__(self, parser):
+        factory = parser.add_subparsers(**self.kwargs)
+        # hack: bypass bug in python3 argparse
+        # http://stackoverflow.com/questions/22990977/why-does-this-argparse-code-behave-differently-between-python-2-and-3
+        factory.required = True
+        if self.lazy or any(isinstance(v, str) for v in self.dct.values()):
+            factory.choices = factory._name_parser_map = _LazyParserMap()
+        builds = []
+        for name in sorted(self.dct.keys()):
+            funcs = self.dct[name]
+            if name in self.subcommand_help:
+                _subparser = factory.add_parser(
+                    name, help=self.subcommand_help[name])
+            else:
+                _subparser = factory.add_parser(name)
+            if isinstance(funcs, str):
+                _subparser.set_defaults(**{
+                    MAIN_DEST: "%s:main" % funcs.partition(':')[0]})
+                factory.choices.defer(
+                    name, functools.partial(_build_from_target, funcs))
+            elif self.lazy:
+                factory.choices.defer(
+                    name, functools.partial(build_arg_parser, funcs))
+            else:
+                builds.append((name, funcs, _subparser))
+        if self.threads and _instrumentation is None and all(
+                isinstance(sub, argparse.ArgumentParser)
+                and type(sub) is sub.__class__ for _, _, sub in builds):
+            # each thread only modifies its own subparser.  Stand-ins for
+            # parsers (ie argparse_tools.validate's fake parsers) and
+            # instrumentation aren't thread-safe, so they build serially
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(self.threads) as pool:
+                list(pool.map(
+                    lambda build: build_arg_parser(build[1], build[2]),
+                    builds))
+        else:
+            for name, funcs, _subparser in builds:
+                if _instrumentation is None:
+                    build_arg_parser(funcs, _subparser)
+                else:
+                    _instrumentation.record(
+                        'subparser', name, build_arg_parser, funcs,
+                        _subparser)
+
+    def _key(self):
+        return (self.dct, self.lazy, self.subcommand_help, self.kwargs)
+
+    def __reduce__(self):
+        return (SubparsersSpec, (
+            self.dct, self.lazy, self.subcommand_help, self.kwargs,
+            self.threads))
+
+    @property
+    def children(self):
+        """The funcs of every subcommand that isn't a module path"""
+        return [f for name in sorted(self.dct)
+                if not isinstance(self.dct[name], str)
+                for f in self.dct[name]]
+
+    @property
+    def name(self):
+        return 'add_subparsers(%s)' % sorted(self.dct)
+
+    def as_dict(self):
+        return {'type': 'add_subparsers', 'dct': _as_dict(self.dct),
+                'lazy': self.lazy, 'subcommand_help': self.subcommand_help,
+                'kwargs': dict(self.kwargs)}
+
+    def __repr__(self):
+        return 'add_subparsers(%r%s)' % (self.dct, ''.join(
+            ', %s=%r' % kv for kv in sorted(self.kwargs.items())))
+
+
+def add_subparsers(dct, lazy=False, subcommand_help=None, threads=None,
+                   **kwargs):
     """
     Declarative way to define subparsers.
-    Returns a closure that accepts a parent parser and adds subparsers to it.
+    Returns a SubparsersSpec that accepts a parent parser and adds subparsers
+    to it.
 
     `dct` - a dict like
         {"subparserA": [add_argument('--in_a_only'), ...],
-         "subparserB": [add_argument('--in_b_only'), ...]
+         "subparserB": [add_argument('--in_b_only'), ...],
+         "subparserC": "mypkg.cmds.subparser_c:build_arg_parser",
         }
+        A value may be a string "module.path:attr" pointing to a list of
+        funcs, a func or a build_arg_parser(...) closure.  The module is only
+        imported if argparse dispatches to that subcommand, and `dispatch(ns)`
+        will call that module's main(ns).
+    `lazy` - (bool) if True, only register the subcommand names up front and
+             add each subparser's arguments the first time argparse
+             dispatches to it.  Useful for CLIs with many subcommands, where
+             only one subcommand is run per invocation.
+    `subcommand_help` - None or a dict mapping subcommand names to the
+                        one-line help shown in the parent parser's help
+    `threads` - None or the number of threads that build the subcommands
+                concurrently.  The subcommands are still added in sorted
+                order.  Only worth it if the funcs spend time outside the
+                GIL, like reading files.  Ignored if `lazy` is True.
+
+    `kwargs` are params passed to argparse.ArgumentParser.add_subparsers
 
     Meant to be used like this:
         build_arg_parser([
@@ -223,25 +993,484 @@ def add_subparsers(dct, **kwargs):
                 'subparserB': [add_argument('--in_b_only')]})
         ])
     """
-    def _add_subparsers(parser):
-        factory = parser.add_subparsers(**kwargs)
-        # hack: bypass bug in python3 argparse
-        # http://stackoverflow.com/questions/22990977/why-does-this-argparse-code-behave-differently-between-python-2-and-3
-        factory.required = True
-        for name in sorted(dct.keys()):
-            funcs = dct[name]
-            _subparser = factory.add_parser(name)
-            build_arg_parser(funcs, _subparser)
-    return _add_subparsers
+    return SubparsersSpec(dct, lazy, subcommand_help or {}, kwargs, threads)
+
+
+class FrozenNamespace(tuple):
+    """An immutable, hashable namespace that stores its values in a tuple.
+
+    It supports attribute access, `dest in ns` and equality like an
+    argparse.Namespace, and it equals a Namespace with the same attributes.
+    Like a Namespace, it is always true and can't be ordered.  It is only
+    hashable if its values are, once lists, dicts and sets are converted to
+    tuples and frozensets; hash() raises TypeError otherwise, ie for
+    bytearray values.  Use freeze() to create one.  vars() doesn't work on a
+    FrozenNamespace; use ns._asdict() instead.  len(), indexing and
+    iteration see the tuple of values, which a Namespace doesn't have.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __bool__(self):
+        return True
+
+    def _unorderable(self, other):
+        raise TypeError("FrozenNamespaces can't be ordered")
+    __lt__ = __le__ = __gt__ = __ge__ = _unorderable
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenNamespace):
+            if self._fields == other._fields:
+                return tuple.__eq__(self, other)
+            return self._asdict() == other._asdict()
+        if isinstance(other, argparse.Namespace):
+            return self._asdict() == vars(other)
+        if isinstance(other, tuple):
+            return False
+        return NotImplemented
+
+    def __ne__(self, other):
+        rv = self.__eq__(other)
+        return rv if rv is NotImplemented else not rv
+
+    def __hash__(self):
+        try:
+            return hash(frozenset(
+                (k, _hashable(v)) for k, v in zip(self._fields, self)))
+        except TypeError as err:
+            raise TypeError("unhashable FrozenNamespace: %s" % err)
+
+    def __repr__(self):
+        return 'FrozenNamespace(%s)' % ', '.join(
+            '%s=%r' % kv for kv in zip(self._fields, self))
+
+    def __reduce__(self):
+        return (_frozen_namespace, (self._fields, tuple(self)))
+
+
+# tuple of dests -> FrozenNamespace subclass with those dests
+_FROZEN_CLASSES = {}
+
+
+def _frozen_class(fields):
+    cls = _FROZEN_CLASSES.get(fields)
+    if cls is None:
+        dct = dict(
+            (field, property(operator.itemgetter(i)))
+            for i, field in enumerate(fields))
+        dct.update(__slots__=(), _fields=fields)
+        cls = _FROZEN_CLASSES[fields] = type(
+            'FrozenNamespace', (FrozenNamespace, ), dct)
+    return cls
+
+
+def _frozen_namespace(fields, values):
+    return tuple.__new__(_frozen_class(fields), values)
+
+
+def freeze(ns):
+    """Return a FrozenNamespace with the same attributes as a Namespace.
 
+    The FrozenNamespace classes are generated once per set of dests"""
+    if isinstance(ns, FrozenNamespace):
+        return ns
+    dct = vars(ns)
+    return tuple.__new__(_frozen_class(tuple(dct)), dct.values())
 
-def build_arg_parser(funcs=None, parser=None, **argument_parser_kwargs):
+
+class _OptionView(object):
+    """A parser whose option strings are limited to some candidates.  Lets
+    argparse match abbreviations against a few options, not all of them"""
+    __slots__ = ('_parser', '_option_string_actions')
+
+    def __init__(self, parser, option_string_actions):
+        self._parser = parser
+        self._option_string_actions = option_string_actions
+
+    def __getattr__(self, name):
+        return getattr(self._parser, name)
+
+
+ParseCacheInfo = collections.namedtuple(
+    'ParseCacheInfo', 'hits misses maxsize currsize')
+# values that a cached parse result can share between callers
+_IMMUTABLE_TYPES = (
+    type(None), bool, int, float, complex, str, bytes, frozenset)
+
+
+class _ArgumentGroup(argparse._ArgumentGroup):
+    """An argument group that doesn't modify actions shared with other
+    parsers when resolving conflicts.  See template"""
+    def __init__(self, container, *args, **kwargs):
+        super(_ArgumentGroup, self).__init__(container, *args, **kwargs)
+        self._parser = getattr(container, '_parser', container)
+
+    def _handle_conflict_resolve(self, action, conflicting_actions):
+        super(_ArgumentGroup, self)._handle_conflict_resolve(
+            action, self._parser._unshare_conflicts(conflicting_actions))
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """An argparse.ArgumentParser that caches its rendered help and usage.
+
+    The cached text is rendered again whenever arguments, groups, defaults or
+    subcommands are added, or the terminal width changes.  If you modify
+    an existing argument in place, call invalidate_help_cache()
+
+    Option strings are kept in a sorted index, so resolving an abbreviation
+    like --verb (for --verbose) looks at the few options it could match,
+    rather than every option of the parser.
+
+    If `frozen` is True, parsing returns a FrozenNamespace rather than an
+    argparse.Namespace.  See enable_parse_cache to memoize parse_args
+    """
+    # subparsers always parse into a Namespace
+    frozen = False
+
+    def __init__(self, *args, **kwargs):
+        super(ArgumentParser, self).__init__(*args, **kwargs)
+        self._help_cache = {}
+        self._defaults_version = 0
+        self._option_index = (0, [], {})
+        # the actions shared with other parsers.  See template
+        self._shared_actions = set()
+        self._parse_cache = None
+
+    def enable_parse_cache(self, maxsize=1024):
+        """Memoize parse_args in a least recently used cache of `maxsize`
+        results, keyed by the list of arguments.  The parser then returns
+        FrozenNamespaces.  Results holding mutable values, like lists, are
+        deep-copied on each cache hit, so results are always safe to share.
+
+        Only successful parses are cached.  Results that can't be copied,
+        like open files, aren't cached, nor are command-lines that read
+        arguments from files (see fromfile_prefix_chars).  The cache is
+        cleared when arguments or defaults are added to this parser.  Call
+        clear_parse_cache() after any other change to the parser or its
+        subparsers.
+        """
+        self.frozen = True
+        self._parse_cache = collections.OrderedDict()
+        self._parse_cache_lock = threading.RLock()
+        self._parse_cache_maxsize = maxsize
+        self._parse_cache_version = None
+        self._parse_cache_stats = [0, 0]  # hits, misses
+
+    def clear_parse_cache(self):
+        with self._parse_cache_lock:
+            self._parse_cache.clear()
+            self._parse_cache_stats[:] = [0, 0]
+
+    def __getstate__(self):
+        # rendered help and parse results aren't pickled, nor are locks
+        state = dict(self.__dict__)
+        state['_help_cache'] = {}
+        if self._parse_cache is not None:
+            state['_parse_cache'] = collections.OrderedDict()
+            state['_parse_cache_stats'] = [0, 0]
+            del state['_parse_cache_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._parse_cache is not None:
+            self._parse_cache_lock = threading.RLock()
+
+    def parse_cache_info(self):
+        """Return the (hits, misses, maxsize, currsize) of the parse cache"""
+        hits, misses = self._parse_cache_stats
+        return ParseCacheInfo(
+            hits, misses, self._parse_cache_maxsize, len(self._parse_cache))
+
+    def _replace_action(self, action, replacement):
+        """Replace an action with another one everywhere this parser, its
+        groups and mutually exclusive groups refer to it"""
+        self._actions[self._actions.index(action)] = replacement
+        for option_string in action.option_strings:
+            if self._option_string_actions.get(option_string) is action:
+                self._option_string_actions[option_string] = replacement
+        replacement.container = self
+        for group in self._action_groups + self._mutually_exclusive_groups:
+            actions = group._group_actions
+            if action in actions:
+                actions[actions.index(action)] = replacement
+                if group in self._action_groups:
+                    replacement.container = group
+        self._shared_actions.discard(action)
+
+    def _add_shared_actions(self, container):
+        """Add the actions of another parser to this one, like argparse's
+        parents= does, without copying them.  Unlike parents=, mutually
+        exclusive groups stay in their argument group"""
+        title_group_map = dict((g.title, g) for g in self._action_groups)
+        group_map = {}
+        for group in container._action_groups:
+            if group.title not in title_group_map:
+                title_group_map[group.title] = self.add_argument_group(
+                    title=group.title, description=group.description,
+                    conflict_handler=group.conflict_handler)
+            for action in group._group_actions:
+                group_map[action] = title_group_map[group.title]
+        for group in container._mutually_exclusive_groups:
+            parent = getattr(group._container, 'title', None)
+            mutex_group = title_group_map.get(parent, self) \
+                .add_mutually_exclusive_group(required=group.required)
+            for action in group._group_actions:
+                group_map[action] = mutex_group
+        for action in container._actions:
+            group_map.get(action, self)._add_action(action)
+        self._defaults.update(container._defaults)
+        self._shared_actions.update(container._actions)
+
+    def _unshare_action(self, action):
+        """Give this parser its own copy of a shared action, so that it can
+        be modified.  Return the copy"""
+        replacement = copy.copy(action)
+        replacement.option_strings = list(action.option_strings)
+        self._replace_action(action, replacement)
+        return replacement
+
+    def _unshare_conflicts(self, conflicting_actions):
+        """conflict_handler='resolve' removes option strings from the
+        conflicting actions, so it must be given copies of shared ones"""
+        copies = {}
+        for _, conflicting in conflicting_actions:
+            if conflicting in self._shared_actions:
+                copies[conflicting] = self._unshare_action(conflicting)
+        return [(option_string, copies.get(conflicting, conflicting))
+                for option_string, conflicting in conflicting_actions]
+
+    def _handle_conflict_resolve(self, action, conflicting_actions):
+        super(ArgumentParser, self)._handle_conflict_resolve(
+            action, self._unshare_conflicts(conflicting_actions))
+
+    def add_argument_group(self, *args, **kwargs):
+        group = _ArgumentGroup(self, *args, **kwargs)
+        self._action_groups.append(group)
+        return group
+
+    def _get_option_index(self):
+        """Return (sorted option strings, {option string: position}).
+        Argument groups share the parser's _option_string_actions, and
+        argparse only ever removes an option string to add it again, so the
+        index is current while the number of option strings is unchanged"""
+        actions = self._option_string_actions
+        index = self._option_index
+        if index[0] != len(actions):
+            index = self._option_index = (
+                len(actions), sorted(actions),
+                dict((o, i) for i, o in enumerate(actions)))
+        return index[1], index[2]
+
+    def _get_option_tuples(self, option_string):
+        keys, positions = self._get_option_index()
+        # argparse matches options that start with the text before any "=",
+        # and single-dash options that equal its first 2 characters
+        prefix = option_string.split('=', 1)[0]
+        candidates = set()
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            candidates.add(keys[i])
+            i += 1
+        if option_string[:2] in positions:
+            candidates.add(option_string[:2])
+        actions = self._option_string_actions
+        view = _OptionView(self, dict(
+            (o, actions[o]) for o in sorted(candidates, key=positions.get)))
+        return argparse.ArgumentParser._get_option_tuples(view, option_string)
+
+    def _help_cache_key(self):
+        # argparse's HelpFormatter also imports shutil on first use
+        import shutil
+        if self._subparsers is not None:
+            n_subcommands = sum(
+                len(getattr(action, '_choices_actions', ()))
+                for action in self._subparsers._group_actions)
+        else:
+            n_subcommands = 0
+        return (
+            len(self._actions), len(self._action_groups),
+            len(self._mutually_exclusive_groups), n_subcommands,
+            self._defaults_version, self.prog, self.usage, self.description,
+            self.epilog, shutil.get_terminal_size().columns)
+
+    def _cached(self, kind, render):
+        key = self._help_cache_key()
+        cached = self._help_cache.get(kind)
+        if cached is None or cached[0] != key:
+            if _instrumentation is None:
+                text = render()
+            else:
+                text = _instrumentation.record(kind, self.prog, render)
+            cached = self._help_cache[kind] = (key, text)
+        return cached[1]
+
+    def invalidate_help_cache(self):
+        self._help_cache = {}
+
+    def set_defaults(self, **kwargs):
+        self._defaults_version += 1
+        if self._shared_actions:
+            for action in list(self._actions):
+                if action.dest in kwargs \
+                        and action in self._shared_actions:
+                    self._unshare_action(action)
+        super(ArgumentParser, self).set_defaults(**kwargs)
+
+    def parse_known_args(self, args=None, namespace=None):
+        _parse = super(ArgumentParser, self).parse_known_args
+        if _instrumentation is None:
+            namespace, extras = _parse(args, namespace)
+        else:
+            namespace, extras = _instrumentation.record(
+                'parse', self.prog, _parse, args, namespace)
+        if self.frozen:
+            namespace = freeze(namespace)
+        return namespace, extras
+
+    def _parse_args(self, args, namespace):
+        return super(ArgumentParser, self).parse_args(args, namespace)
+
+    def parse_args(self, args=None, namespace=None):
+        cache = self._parse_cache
+        if cache is None or namespace is not None:
+            return self._parse_args(args, namespace)
+        key = tuple(sys.argv[1:] if args is None else args)
+        prefix_chars = self.fromfile_prefix_chars
+        if prefix_chars and any(
+                arg and arg[0] in prefix_chars for arg in key):
+            # the files that the arguments are read from may change
+            return self._parse_args(list(key), None)
+        version = (len(self._actions), self._defaults_version)
+        with self._parse_cache_lock:
+            if version != self._parse_cache_version:
+                cache.clear()
+                self._parse_cache_version = version
+            entry = cache.get(key)
+            if entry is not None:
+                cache.move_to_end(key)
+                self._parse_cache_stats[0] += 1
+        if entry is not None:
+            ns, mutable = entry
+            return copy.deepcopy(ns) if mutable else ns
+        ns = self._parse_args(list(key), None)
+        mutable = any(
+            not isinstance(v, _IMMUTABLE_TYPES) for v in ns)
+        rv = ns
+        if mutable:
+            try:
+                rv = copy.deepcopy(ns)
+            except (TypeError, copy.Error):
+                # ie open files, which can't be shared either
+                rv = None
+        with self._parse_cache_lock:
+            self._parse_cache_stats[1] += 1
+            if rv is not None:
+                cache[key] = (ns, mutable)
+                if len(cache) > self._parse_cache_maxsize:
+                    cache.popitem(last=False)
+        return ns if rv is None else rv
+
+    def format_usage(self):
+        return self._cached(
+            'usage', super(ArgumentParser, self).format_usage)
+
+    def format_help(self):
+        return self._cached(
+            'help', super(ArgumentParser, self).format_help)
+
+    def print_help(self, file=None):
+        if getattr(_raising, 'active', False):
+            raise ParseError('help requested')
+        super(ArgumentParser, self).print_help(file)
+
+    def _print_message(self, message, file=None):
+        if not getattr(_raising, 'active', False):
+            super(ArgumentParser, self)._print_message(message, file)
+
+    def exit(self, status=0, message=None):
+        if getattr(_raising, 'active', False):
+            raise ParseError(
+                message.strip() if message else 'exit requested')
+        super(ArgumentParser, self).exit(status, message)
+
+    def error(self, message):
+        if getattr(_raising, 'active', False):
+            raise ParseError(message)
+        super(ArgumentParser, self).error(message)
+
+
+def prerender_help(parser):
+    """Render and cache the help and usage of an argparse_tools.ArgumentParser
+    and of its subparsers.  Lazy subparsers that haven't been built yet are
+    skipped"""
+    if not isinstance(parser, ArgumentParser):
+        return
+    parser.format_usage()
+    parser.format_help()
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            for name, subparser in dict.items(action.choices):
+                if name not in getattr(action.choices, '_pending', ()):
+                    prerender_help(subparser)
+
+
+class NonExitingArgumentParser(ArgumentParser):
+    """An argparse.ArgumentParser that raises a ParseError on invalid input,
+    rather than formatting the usage, printing it and exiting.
+
+    The subparsers of a NonExitingArgumentParser are also
+    NonExitingArgumentParsers
+    """
+    def __init__(self, *args, **kwargs):
+        # let ArgumentErrors through so we know which argument failed
+        kwargs.setdefault('exit_on_error', False)
+        super(NonExitingArgumentParser, self).__init__(*args, **kwargs)
+
+    def parse_known_args(self, args=None, namespace=None):
+        try:
+            return super(NonExitingArgumentParser, self).parse_known_args(
+                args, namespace)
+        except argparse.ArgumentError as err:
+            raise ParseError(err.message, err.argument_name)
+
+    def _parse_args(self, args, namespace):
+        namespace, extras = self.parse_known_args(args, namespace)
+        if extras:
+            raise ParseError(
+                'unrecognized arguments: %s' % ' '.join(extras), extras[0])
+        return namespace
+
+    def error(self, message):
+        raise ParseError(message)
+
+
+def build_arg_parser(funcs=None, parser=None, cache_dir=None,
+                     raise_errors=False, prerender=False, frozen=False,
+                     parse_cache_size=None, **argument_parser_kwargs):
     """Returns an argparse.ArgumentParser that applies each func in funcs to
     the parser.
 
     funcs - None or a list of funcs that accept an argparse.ArgumentParser,
     parser - None or an instance of an argparse.ArgumentParser.  If not given,
         create our own.
+    cache_dir - None or a directory in which to cache the built parser.
+        Later builds of the same funcs load the cached parser instead of
+        calling the funcs.  See argparse_tools.cache
+    raise_errors - if True, create a NonExitingArgumentParser, which raises
+        a ParseError on invalid input instead of printing usage and exiting
+    prerender - if True, render and cache the help and usage text of the
+        parser and its subparsers once the funcs are applied
+    frozen - if True, the parser returns immutable, hashable FrozenNamespaces
+        that use much less memory than an argparse.Namespace
+    parse_cache_size - if given, memoize up to this many parse_args results.
+        See ArgumentParser.enable_parse_cache
 
     If funcs is not None, return a closure.
 
@@ -259,14 +1488,72 @@ def build_arg_parser(funcs=None, parser=None, **argument_parser_kwargs):
     else:
         _closure = True
     if not parser:
-        parser = argparse.ArgumentParser(
+        if raise_errors:
+            parser_class = NonExitingArgumentParser
+        else:
+            parser_class = ArgumentParser
+        parser = parser_class(
             formatter_class=argparse.ArgumentDefaultsHelpFormatter,
             **argument_parser_kwargs)
-    for func in funcs:
-        if func:
-            func(parser)
+    if frozen:
+        if not isinstance(parser, ArgumentParser):
+            raise ValueError(
+                "frozen=True requires an argparse_tools.ArgumentParser")
+        parser.frozen = True
+    if parse_cache_size:
+        if not isinstance(parser, ArgumentParser):
+            raise ValueError(
+                "parse_cache_size requires an argparse_tools.ArgumentParser")
+        parser.enable_parse_cache(parse_cache_size)
+    if cache_dir is not None:
+        from argparse_tools import cache
+        cache.build_cached(funcs, parser, cache_dir)
+    else:
+        for func in funcs:
+            if func:
+                _apply(func, parser)
+    if prerender:
+        prerender_help(parser)
     if _closure:
         def _I_return_an_ArgumentParser():
             return parser
+        _I_return_an_ArgumentParser.funcs = funcs
         return _I_return_an_ArgumentParser
     return parser
+
+
+# Submodules, and the public names they define, are only imported the first
+# time they are used, to keep `import argparse_tools` fast.  Don't import
+# anything heavy at the top of this module.
+_SUBMODULES = frozenset([
+    'batch', 'cache', 'client', 'completion', 'config', 'dispatcher',
+    'examples', 'instrument', 'partial', 'server', 'validate'])
+_LAZY_ATTRS = {
+    'parse_many': 'batch',
+    'parse_stream': 'batch',
+    'parse_columns': 'batch',
+    'LayeredDefaults': 'config',
+    'ConfigFile': 'config',
+    'EnvVars': 'config',
+    'DefaultFromConfig': 'config',
+    'Dispatcher': 'dispatcher',
+    'Instrumentation': 'instrument',
+    'parse_partial': 'partial',
+    'find_conflicts': 'validate',
+    'check_conflicts': 'validate',
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('%s.%s' % (__name__, name))
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(
+            '%s.%s' % (__name__, _LAZY_ATTRS[name]))
+        return getattr(module, name)
+    raise AttributeError(
+        "module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | set(_LAZY_ATTRS))
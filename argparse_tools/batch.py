@@ -0,0 +1,273 @@
+"""
+Tools to parse many command-lines with one parser, ie to validate a queue of
+job submissions.
+"""
+import argparse
+import array
+import collections
+import itertools
+import shlex
+import sys
+
+from argparse_tools import DefaultFromEnv, ParseError, _raising, parse_bool
+
+# parsers shared with forked worker processes.  see parse_many
+_WORKER_STATE = {}
+_WORKER_TOKENS = itertools.count()
+
+
+def _defaults_table(parser):
+    """Return the {dest: default} that parser.parse_args() would apply to an
+    empty namespace"""
+    defaults = {}
+    for action in parser._actions:
+        if action.dest is not argparse.SUPPRESS \
+                and action.default is not argparse.SUPPRESS:
+            defaults.setdefault(action.dest, action.default)
+    for dest, default in parser._defaults.items():
+        defaults.setdefault(dest, default)
+    return defaults
+
+
+def _parse_one(parser, argv, defaults):
+    """Return the parsed namespace, or a ParseError if argv is invalid"""
+    if isinstance(argv, ParseError):
+        return argv
+    namespace = argparse.Namespace()
+    # the namespace already has every default, so argparse skips that step
+    namespace.__dict__.update(defaults)
+    return _parse_into(parser, list(argv), namespace)
+
+
+def _parse_into(parser, argv, namespace):
+    """Parse argv into namespace.  Return the namespace, or a ParseError if
+    argv is invalid"""
+    # only this thread's parsers raise errors, and only while parsing here
+    previous = getattr(_raising, 'active', False)
+    _raising.active = True
+    try:
+        return parser.parse_args(argv, namespace)
+    except ParseError as err:
+        if err.argv is None:
+            err.argv = argv
+        return err
+    except SystemExit as err:
+        # not an argparse_tools parser, so argparse printed the error
+        return ParseError('exit with status %s' % err.code, argv=argv)
+    finally:
+        _raising.active = previous
+
+
+def _parse_in_worker(args):
+    token, argv = args
+    parser, defaults = _WORKER_STATE[token]
+    return _parse_one(parser, argv, defaults)
+
+
+def parse_many(parser, argvs, processes=None, chunksize=100):
+    """Parse each list of command-line arguments in `argvs` with `parser`.
+
+    Yield, in order, an argparse.Namespace for each valid argv, or a
+    ParseError for each invalid one.  Invalid command-lines never raise
+    SystemExit, and with an argparse_tools.ArgumentParser they print
+    nothing, so parse_many can run in many threads at once.  A command-line
+    with -h is a ParseError too.
+
+    `parser` - an argparse_tools.ArgumentParser, ie from
+               build_arg_parser(...)().  Other argparse parsers print their
+               errors, and their ParseErrors only give the exit status.
+    `argvs` - an iterable of lists of strings.  It is consumed lazily.
+    `processes` - if greater than 1, parse in this many forked worker
+                  processes.  Only worth it for very large batches, and only
+                  on platforms that support fork.  Parsed values must be
+                  picklable.
+    `chunksize` - number of argvs sent to a worker process at a time
+
+        for ns in parse_many(parser, [['--a', '1'], ['--b']]):
+            if isinstance(ns, ParseError):
+                print(ns.argv, ns.message)
+    """
+    defaults = _defaults_table(parser)
+    if not processes or processes <= 1:
+        for argv in argvs:
+            yield _parse_one(parser, argv, defaults)
+        return
+
+    # worker processes are forked, so they inherit the parser
+    import multiprocessing
+    token = next(_WORKER_TOKENS)
+    _WORKER_STATE[token] = (parser, defaults)
+    try:
+        pool = multiprocessing.get_context('fork').Pool(processes)
+    finally:
+        del _WORKER_STATE[token]
+    # Pool.imap reads its whole input up front, so feed it a window at a
+    # time to keep long or endless streams of argvs out of memory
+    argvs = iter(argvs)
+    window = chunksize * processes * 4
+    try:
+        while True:
+            tasks = [(token, argv) for argv in itertools.islice(argvs, window)]
+            if not tasks:
+                break
+            for rv in pool.imap(_parse_in_worker, tasks, chunksize):
+                yield rv
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def read_argvs(source):
+    """Lazily read one command-line per line from `source`, splitting each
+    line into arguments like a posix shell would.
+
+    Yield (line number, list of arguments) for each line, or (line number,
+    ParseError) if a line can't be split, ie because of an unclosed quote.
+    Blank lines and comments (from # to the end of the line) are skipped.
+
+    `source` - a path, "-" for stdin, a file object or an iterable of lines
+    """
+    if isinstance(source, str):
+        if source == '-':
+            for rv in read_argvs(sys.stdin):
+                yield rv
+            return
+        with open(source) as fin:
+            for rv in read_argvs(fin):
+                yield rv
+        return
+    for lineno, line in enumerate(source, 1):
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as err:
+            yield lineno, ParseError(
+                'line %s: %s' % (lineno, err), argv=[line.rstrip('\n')])
+            continue
+        if argv:
+            yield lineno, argv
+
+
+def parse_stream(parser, source, processes=None, chunksize=100):
+    """Parse each command-line in a file, pipe or iterable of lines, without
+    reading it all into memory.  See read_argvs for the format of `source`,
+    and parse_many for the other arguments.
+
+    Yield (line number, argparse.Namespace or ParseError) for each
+    command-line, in order.
+
+        for lineno, ns in parse_stream(parser, 'jobs.txt'):
+            if isinstance(ns, ParseError):
+                print('jobs.txt:%s: %s' % (lineno, ns.message))
+    """
+    lines, argvs = itertools.tee(read_argvs(source))
+    # lines that can't be split are passed through as ParseErrors
+    results = parse_many(
+        parser, (argv for _, argv in argvs), processes, chunksize)
+    for (lineno, _), rv in zip(lines, results):
+        yield lineno, rv
+
+
+Columns = collections.namedtuple('Columns', 'columns valid errors')
+
+# array.array typecodes of the columns of single-valued options
+_TYPECODES = {int: 'q', float: 'd', parse_bool: 'b'}
+
+
+def _typecode(action):
+    if isinstance(action, (argparse._StoreTrueAction,
+                           argparse._StoreFalseAction)):
+        return 'b'
+    if isinstance(action, argparse._CountAction):
+        return 'q'
+    if isinstance(action, (argparse._StoreAction, DefaultFromEnv)) \
+            and action.nargs in (None, '?'):
+        return _TYPECODES.get(action.type)
+    return None
+
+
+def _column_types(parser, types=None):
+    """Return {dest: array typecode or None} for the arguments of a parser
+    and its built subparsers.  None means the column is a list"""
+    if types is None:
+        types = {}
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            pending = getattr(action.choices, '_pending', {})
+            for name, subparser in dict.items(action.choices):
+                if name not in pending:
+                    _column_types(subparser, types)
+        elif action.dest is not argparse.SUPPRESS:
+            code = _typecode(action)
+            if types.get(action.dest, code) != code:
+                code = None
+            types[action.dest] = code
+    return types
+
+
+def _append(columns, valid, dest, value):
+    try:
+        columns[dest].append(value)
+    except (TypeError, OverflowError):
+        # ie an int too large for the array, or a default of another type
+        columns[dest] = [
+            x if ok else None for x, ok in zip(columns[dest], valid[dest])]
+        columns[dest].append(value)
+
+
+def parse_columns(parser, argvs):
+    """Parse each list of command-line arguments in `argvs` with `parser`,
+    and store the parsed values by column rather than in a namespace per
+    command-line.
+
+    Return Columns(columns, valid, errors), where
+        `columns` - {dest: column}.  Single-valued int, float and boolean
+                    options (ie store_true) are stored in an array.array of
+                    typecode 'q', 'd' or 'b'.  Other values are stored in
+                    lists, as are int columns with values that don't fit in
+                    64 bits.
+        `valid` - {dest: array.array('b')}, 1 where the column has a value,
+                  or 0 where the value is None, the command-line didn't
+                  define the dest (ie another subcommand was chosen) or it
+                  was invalid.  Missing values are 0 in arrays and None in
+                  lists.
+        `errors` - a list holding None for each valid command-line, or the
+                   ParseError of each invalid one
+
+    Row i of every column belongs to argvs[i].  See parse_many for the other
+    arguments.
+    """
+    types = _column_types(parser)
+    defaults = _defaults_table(parser)
+    columns = {}
+    valid = {}
+    errors = []
+    namespace = argparse.Namespace()
+    for argv in argvs:
+        namespace.__dict__.clear()
+        namespace.__dict__.update(defaults)
+        rv = _parse_into(parser, list(argv), namespace)
+        if isinstance(rv, ParseError):
+            errors.append(rv)
+            values = {}
+        else:
+            errors.append(None)
+            values = vars(rv) if isinstance(rv, argparse.Namespace) \
+                else rv._asdict()
+        for dest in values:
+            if dest not in columns:
+                # the dest of a subparser that wasn't built yet
+                code = types.get(dest)
+                n_rows = len(errors) - 1
+                columns[dest] = array.array(code, bytes(
+                    array.array(code).itemsize * n_rows)) if code \
+                    else [None] * n_rows
+                valid[dest] = array.array('b', bytes(n_rows))
+        for dest, column in columns.items():
+            value = values.get(dest)
+            if value is None:
+                valid[dest].append(0)
+                column.append(0 if isinstance(column, array.array) else None)
+            else:
+                _append(columns, valid, dest, value)
+                valid[dest].append(1)
+    return Columns(columns, valid, errors)
@@ -0,0 +1,229 @@
+"""
+An opt-in, on-disk cache of built parsers.
+
+The first time a list of funcs is built with a cache_dir, the built parser,
+its groups, actions and subparsers are pickled to a file named after a key of
+the funcs.  Later builds of the same funcs unpickle the parser instead of
+calling the funcs.  That is several times faster for CLIs with more than a
+few dozen options, but slower for small ones.  Measure it with the "cached"
+case of benchmarks/bench.py.
+
+The key is a hash of the pickled funcs (so specs returned by add_argument,
+group, etc. are compared by value), plus the mtime and size of the files of
+the modules that define the functions and classes they refer to.  Editing the
+declared spec, or a module that defines a func, invalidates the cache.
+Funcs that can't be pickled, like lambdas and closures, are built without the
+cache, as are parsers that can't be pickled once built.
+
+Lazy subcommands stay lazy: they are built from the live funcs when first
+used.  Defaults that DefaultFromEnv and DefaultFromConfig actions read from
+the environment or config files are read again on every build.
+
+    build_arg_parser([...], cache_dir='~/.cache/mycli')
+"""
+import argparse
+import hashlib
+import io
+import os
+import pickle
+import sys
+import types
+
+import argparse_tools
+
+# bump this whenever the format of the cached parsers changes
+FORMAT_VERSION = 2
+
+# attributes of the parser being built that the cache doesn't replace
+_NOT_CACHED = frozenset([
+    'frozen', '_help_cache', '_parse_cache', '_parse_cache_lock',
+    '_parse_cache_maxsize', '_parse_cache_version', '_parse_cache_stats'])
+# argparse gives every parser its own copy of this function
+_IDENTITY = 'ArgumentParser.__init__.<locals>.identity'
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def _reduce_wrapped(obj):
+    """Return a reduce value for a function hidden by a decorator that sets
+    __wrapped__, like lazy_kwargs, or NotImplemented"""
+    if not isinstance(obj, types.FunctionType) or '<' in obj.__qualname__:
+        return NotImplemented
+    wrapper = sys.modules.get(obj.__module__)
+    for name in obj.__qualname__.split('.'):
+        wrapper = getattr(wrapper, name, None)
+    if wrapper is not obj and getattr(wrapper, '__wrapped__', None) is obj:
+        return (getattr, (wrapper, '__wrapped__'))
+    return NotImplemented
+
+
+class _KeyPickler(pickle.Pickler):
+    """Pickles funcs, recording the modules of the functions and classes
+    they refer to, and the other objects in them"""
+    def __init__(self, file):
+        super(_KeyPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.modules = set()
+        self.objects = []
+
+    def reducer_override(self, obj):
+        if isinstance(obj, (type, types.FunctionType,
+                            types.BuiltinFunctionType)):
+            self.modules.add(getattr(obj, '__module__', None))
+            return _reduce_wrapped(obj)
+        self.objects.append(obj)
+        return NotImplemented
+
+
+class _StatePickler(pickle.Pickler):
+    """Pickles a parser's state, referring to the parser itself and to the
+    objects in its funcs rather than copying them"""
+    def __init__(self, file, parser, objects):
+        super(_StatePickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.parser = parser
+        self.refs = dict((id(obj), i) for i, obj in enumerate(objects))
+
+    def persistent_id(self, obj):
+        if obj is self.parser:
+            return 'parser'
+        elif obj is argparse.SUPPRESS:
+            # argparse compares it by identity
+            return 'SUPPRESS'
+        elif getattr(obj, '__qualname__', None) == _IDENTITY:
+            return 'identity'
+        return self.refs.get(id(obj))
+
+    def reducer_override(self, obj):
+        return _reduce_wrapped(obj)
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, parser, objects):
+        super(_StateUnpickler, self).__init__(file)
+        self.parser = parser
+        self.objects = objects
+
+    def persistent_load(self, pid):
+        if pid == 'parser':
+            return self.parser
+        elif pid == 'identity':
+            return self.parser._registries['type'][None]
+        elif pid == 'SUPPRESS':
+            return argparse.SUPPRESS
+        return self.objects[pid]
+
+
+def _module_files(modules):
+    rv = []
+    for name in sorted(m for m in modules if m):
+        path = getattr(sys.modules.get(name), '__file__', None)
+        if path:
+            st = os.stat(path)
+            rv.append((path, st.st_mtime_ns, st.st_size))
+    return rv
+
+
+def _key(funcs, parser):
+    """Return (hex digest, objects in funcs) for funcs built into parser"""
+    buf = io.BytesIO()
+    pickler = _KeyPickler(buf)
+    try:
+        pickler.dump(funcs)
+    except Exception as err:
+        raise Uncacheable("Cannot pickle the funcs: %s" % err)
+    modules = pickler.modules | set(['argparse', 'argparse_tools'])
+    settings = sorted(
+        (k, v) for k, v in vars(parser).items() if k not in _NOT_CACHED
+        and isinstance(v, (str, int, type(None), type)))
+    h = hashlib.sha1(buf.getvalue())
+    h.update(repr((
+        FORMAT_VERSION, sys.version_info[:2], type(parser), settings,
+        _module_files(modules))).encode('utf8'))
+    return h.hexdigest(), pickler.objects
+
+
+def fingerprint(obj):
+    """Return a hex digest that changes whenever the declared spec `obj`
+    (ie a list of funcs passed to build_arg_parser) changes.
+
+    Raise Uncacheable if `obj` can't be pickled
+    """
+    return _key(obj, argparse_tools.ArgumentParser(prog='fingerprint'))[0]
+
+
+def cache_path(funcs, cache_dir, parser):
+    """Return the file that caches the given funcs, and the objects in
+    funcs that the cached parser refers to"""
+    key, objects = _key(funcs, parser)
+    return os.path.join(
+        os.path.expanduser(cache_dir),
+        'argparse_tools-%s.pickle' % key), objects
+
+
+def _reload_defaults(parser):
+    """Read the defaults of actions like DefaultFromEnv again, in the parser
+    and its built subparsers"""
+    for action in parser._actions:
+        # unpickled strings aren't interned, which slows down setattr
+        action.dest = sys.intern(action.dest)
+        init_kwargs = getattr(action, '_init_kwargs', None)
+        if init_kwargs is not None:
+            fresh = type(action)(**init_kwargs)
+            action.default = fresh.default
+            action.required = fresh.required
+        elif isinstance(action, argparse._SubParsersAction):
+            choices = action.choices
+            pending = getattr(choices, '_pending', {})
+            for name, subparser in dict.items(choices):
+                if name not in pending:
+                    _reload_defaults(subparser)
+
+
+def _dump(parser, objects):
+    buf = io.BytesIO()
+    state = dict(
+        (k, v) for k, v in vars(parser).items() if k not in _NOT_CACHED)
+    _StatePickler(buf, parser, objects).dump(state)
+    return buf.getvalue()
+
+
+def _write(path, data):
+    import tempfile
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    fd, tmp = tempfile.mkstemp(dir=dirname)
+    with os.fdopen(fd, 'wb') as fout:
+        fout.write(data)
+    os.replace(tmp, path)
+
+
+def build_cached(funcs, parser, cache_dir):
+    """Apply funcs to the parser, using or populating the cache in
+    cache_dir.  See the module docstring"""
+    try:
+        path, objects = cache_path(funcs, cache_dir, parser)
+    except Uncacheable:
+        return argparse_tools.build_arg_parser(funcs, parser)
+    try:
+        with open(path, 'rb') as fin:
+            data = fin.read()
+    except (IOError, OSError):
+        data = None
+    if data:
+        state = _StateUnpickler(io.BytesIO(data), parser, objects).load()
+        parser.__dict__.update(state)
+        _reload_defaults(parser)
+        return parser
+    elif data is not None:
+        # an empty file marks a parser that can't be pickled
+        return argparse_tools.build_arg_parser(funcs, parser)
+
+    argparse_tools.build_arg_parser(funcs, parser)
+    try:
+        data = _dump(parser, objects)
+    except Exception:
+        data = b''
+    _write(path, data)
+    return parser
@@ -0,0 +1,88 @@
+"""
+Run a command-line through an argparse_tools.server, which forks an already
+imported and built copy of the CLI to handle it.
+
+    $ python -S /path/to/argparse_tools/client.py /tmp/mycli.sock --opt 1
+
+The client passes its argv, environment, working directory and stdin, stdout
+and stderr to the server, forwards SIGINT, SIGTERM and SIGHUP to the forked
+process, and exits with its exit code.
+
+This module doesn't import argparse_tools (or argparse), so that running the
+file directly, rather than with `python -m`, starts as fast as possible.
+"""
+import os
+import signal
+import socket
+import struct
+import sys
+
+FORWARDED_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+
+
+def _recv_exactly(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def encode_request(argv, env, cwd):
+    """Serialize a request as NUL separated fields: cwd, the number of
+    arguments, the arguments and the KEY=value env vars"""
+    fields = [cwd, str(len(argv))] + list(argv) + [
+        '%s=%s' % kv for kv in env.items()]
+    return b'\0'.join(os.fsencode(field) for field in fields)
+
+
+def call(socket_path, argv, env=None, cwd=None, stdio=(0, 1, 2)):
+    """Run argv in the server listening at `socket_path` and return its
+    exit code.
+
+    `env` - the environment variables.  Defaults to os.environ
+    `cwd` - the working directory.  Defaults to the current one
+    `stdio` - the file descriptors that the command reads stdin from and
+              writes stdout and stderr to
+    """
+    payload = encode_request(
+        argv, os.environ if env is None else env,
+        os.getcwd() if cwd is None else cwd)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        socket.send_fds(
+            sock, [struct.pack('!Q', len(payload))], list(stdio))
+        sock.sendall(payload)
+        data = _recv_exactly(sock, 4)
+        if data is None:
+            return 1
+        pid, = struct.unpack('!i', data)
+
+        def forward(signum, frame):
+            os.kill(pid, signum)
+        previous = dict(
+            (signum, signal.signal(signum, forward))
+            for signum in FORWARDED_SIGNALS)
+        try:
+            data = _recv_exactly(sock, 4)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        if data is None:
+            # the forked process died without reporting its exit code
+            return 1
+        return struct.unpack('!i', data)[0]
+    finally:
+        sock.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write(
+            'usage: %s SOCKET_PATH [ARGS ...]\n' % os.path.basename(
+                sys.argv[0]))
+        sys.exit(2)
+    sys.exit(call(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,157 @@
+"""
+Static shell completion for parsers built with argparse_tools.
+
+Walks a built parser once (including its subparsers, argument groups and
+mutually exclusive groups) and writes a compact index of the options,
+subcommands and choices available at each subcommand.  The generated bash or
+zsh completion script loads the index into an associative array when it is
+sourced, so pressing TAB never starts Python and takes the same time however
+large the CLI is.
+
+    $ python -m argparse_tools.completion mypkg.cli:build_arg_parser \\
+        --prog mycli --index ~/.mycli.completion-index > ~/.mycli-completion
+    $ source ~/.mycli-completion
+
+Regenerate the index whenever the CLI changes.  Option values without choices
+complete as file names.
+"""
+import argparse
+import re
+
+import argparse_tools as at
+
+# kinds of index entries
+SUBCOMMANDS = 's'
+OPTIONS = 'o'
+TAKES_VALUE = 'v'
+CHOICES = 'c:'
+
+
+def _words(values):
+    return ' '.join(str(v) for v in values)
+
+
+def completion_index(parser, path='/'):
+    """Return the completion index of a parser as a list of
+    (subcommand path, kind, space separated words) tuples.
+
+    The path of the top-level parser is "/", and the path of subcommand b of
+    subcommand a is "/a/b".
+    """
+    rows = []
+    options = []
+    takes_value = []
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            rows.append((path, SUBCOMMANDS, _words(sorted(action.choices))))
+            for name, subparser in sorted(action.choices.items()):
+                rows.extend(completion_index(
+                    subparser, '%s%s/' % (path, name)))
+            continue
+        if not action.option_strings or action.help == argparse.SUPPRESS:
+            continue
+        options.extend(action.option_strings)
+        if action.nargs != 0:
+            takes_value.extend(action.option_strings)
+            if action.choices is not None:
+                for option_string in action.option_strings:
+                    rows.append((
+                        path, CHOICES + option_string,
+                        _words(action.choices)))
+    rows.append((path, OPTIONS, _words(options)))
+    rows.append((path, TAKES_VALUE, _words(takes_value)))
+    return [(p.rstrip('/') or '/', kind, words) for p, kind, words in rows]
+
+
+def write_index(parser, index_path):
+    """Write the completion index of a parser to a file"""
+    with open(index_path, 'w') as fout:
+        for row in completion_index(parser):
+            fout.write('\t'.join(row) + '\n')
+
+
+_SCRIPT = r'''
+declare -A _argparse_tools_idx_%(name)s
+while IFS=$'\t' read -r _at_path _at_kind _at_words; do
+    _argparse_tools_idx_%(name)s["$_at_path"$'\t'"$_at_kind"]="$_at_words"
+done < %(index)s
+unset _at_path _at_kind _at_words
+
+_argparse_tools_complete_%(name)s() {
+    local cur="${COMP_WORDS[COMP_CWORD]}" path="/" word i takes_value=""
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        word="${COMP_WORDS[i]}"
+        if [[ -n "$takes_value" ]]; then
+            takes_value=""
+        elif [[ "$word" == -* ]]; then
+            if [[ "$word" != *=* && " ${_argparse_tools_idx_%(name)s["$path"$'\t'v]} " == *" $word "* ]]; then
+                takes_value=1
+            fi
+        elif [[ " ${_argparse_tools_idx_%(name)s["$path"$'\t's]} " == *" $word "* ]]; then
+            path="${path%%/}/$word"
+        fi
+    done
+    if [[ -n "$takes_value" ]]; then
+        word="${COMP_WORDS[COMP_CWORD-1]}"
+        COMPREPLY=( $(compgen -W "${_argparse_tools_idx_%(name)s["$path"$'\t'"c:$word"]}" -- "$cur") )
+    elif [[ "$cur" == -* ]]; then
+        COMPREPLY=( $(compgen -W "${_argparse_tools_idx_%(name)s["$path"$'\t'o]}" -- "$cur") )
+    else
+        COMPREPLY=( $(compgen -W "${_argparse_tools_idx_%(name)s["$path"$'\t's]}" -- "$cur") )
+    fi
+}
+complete -o default -F _argparse_tools_complete_%(name)s %(prog)s
+'''
+
+_ZSH_PREAMBLE = '''autoload -U +X compinit && compinit
+autoload -U +X bashcompinit && bashcompinit
+'''
+
+
+def _quote(string):
+    return "'%s'" % string.replace("'", "'\\''")
+
+
+def completion_script(prog, index_path, shell='bash'):
+    """Return a bash or zsh script that completes `prog` using the index
+    written to `index_path` by write_index"""
+    if shell not in ('bash', 'zsh'):
+        raise ValueError("Unsupported shell: %s" % shell)
+    script = _SCRIPT % {
+        'name': re.sub(r'\W', '_', prog),
+        'prog': _quote(prog),
+        'index': _quote(index_path),
+    }
+    if shell == 'zsh':
+        script = _ZSH_PREAMBLE + script
+    return script.lstrip()
+
+
+build_arg_parser = at.build_arg_parser([
+    at.add_argument(
+        'parser', help=(
+            'module path of the parser to complete, like'
+            ' "mypkg.cli:build_arg_parser".  It may point to a parser, or to'
+            ' a function that returns one')),
+    at.add_argument('--prog', required=True, help='name of the command'),
+    at.add_argument(
+        '--index', required=True, help='where to write the completion index'),
+    at.add_argument('--shell', choices=['bash', 'zsh'], default='bash'),
+], description=(
+    'Write a completion index for a parser, and print a shell script that'
+    ' completes it'))
+
+
+def main(ns):
+    import os
+    parser = at._import_target(ns.parser)
+    if not isinstance(parser, argparse.ArgumentParser):
+        parser = parser()
+    index_path = os.path.abspath(os.path.expanduser(ns.index))
+    write_index(parser, index_path)
+    print(completion_script(ns.prog, index_path, ns.shell))
+
+
+if __name__ == '__main__':
+    NS = build_arg_parser().parse_args()
+    main(NS)
@@ -0,0 +1,243 @@
+"""
+Layered defaults: resolve each option's default from config files,
+environment variables and the hardcoded default=, in a single pass.
+
+    config = LayeredDefaults([
+        EnvVars(prefix='myapp_'),           # highest precedence
+        ConfigFile('~/.myapp.ini', section='myapp'),
+        ConfigFile('/etc/myapp.json'),      # lowest precedence
+    ])
+    build_arg_parser([
+        add_argument('--workers', type=int, default=1,
+                     action=DefaultFromConfig, config=config),
+        ...
+    ])
+    config.source('workers')  # --> ie 'env:MYAPP_WORKERS'
+
+Values given on the command-line always take precedence over the layers, and
+the hardcoded default= is only used if no layer defines the option.
+
+Each layer is read once per LayeredDefaults.  Config files are parsed once per
+process (until their mtime or size changes), so sharing config files between
+many parsers or subparsers is cheap.  Keys in config files and env vars match
+an option's dest case-insensitively, and dashes match underscores.
+"""
+import argparse
+import os
+
+from argparse_tools import (
+    EnvSnapshot, EnvironmentVarInvalid, _check_default_type,
+    _coerce_env_value, _coerce_values, _takes_many)
+
+# (path, section) -> ((st_mtime_ns, st_size), data)
+_FILE_CACHE = {}
+
+
+class ConfigValueInvalid(Exception):
+    pass
+
+
+def _normalize(key):
+    return key.lower().replace('-', '_')
+
+
+def _parse_json(path, section):
+    import json
+    with open(path) as fin:
+        data = json.load(fin)
+    return data.get(section, {}) if section is not None else data
+
+
+def _parse_yaml(path, section):
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError(
+            "You must install PyYAML to read yaml config file: %s" % path)
+    with open(path) as fin:
+        data = yaml.safe_load(fin) or {}
+    return data.get(section, {}) if section is not None else data
+
+
+def _parse_ini(path, section):
+    import configparser
+    parser = configparser.ConfigParser(interpolation=None)
+    with open(path) as fin:
+        parser.read_file(fin)
+    if section is None:
+        return dict(parser.defaults())
+    if not parser.has_section(section):
+        return {}
+    return dict(parser.items(section))
+
+
+_PARSERS = {
+    '.json': _parse_json,
+    '.yaml': _parse_yaml,
+    '.yml': _parse_yaml,
+    '.ini': _parse_ini,
+    '.cfg': _parse_ini,
+    '.conf': _parse_ini,
+}
+
+
+def load_config_file(path, section=None):
+    """Return the contents of a json, yaml or ini config file as a dict.
+
+    Files are only parsed again if their mtime or size changed since the last
+    time this process loaded them.  Don't modify the returned dict.
+
+    `section` - for ini files, the section to read (by default, the
+                [DEFAULT] section).  For json and yaml files, None or the
+                top-level key to read.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _PARSERS:
+        raise ValueError(
+            "Unrecognized config file type: %s.  Expected one of: %s" % (
+                path, ', '.join(sorted(_PARSERS))))
+    st = os.stat(path)
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _FILE_CACHE.get((path, section))
+    if cached is None or cached[0] != version:
+        cached = (version, _PARSERS[ext](path, section))
+        _FILE_CACHE[(path, section)] = cached
+    return cached[1]
+
+
+class ConfigFile(object):
+    """A layer of defaults read from a json, yaml or ini config file.
+
+    `required` - if False, a missing file is an empty layer
+    """
+    def __init__(self, path, section=None, required=False):
+        self.path = path
+        self.section = section
+        self.required = required
+        self.name = 'file:%s' % path
+
+    def load(self):
+        """Return a {key: value} dict of the defaults in this layer"""
+        try:
+            return load_config_file(self.path, self.section)
+        except (IOError, OSError):
+            if self.required:
+                raise
+            return {}
+
+
+class EnvVars(object):
+    """A layer of defaults read from environment variables named
+    PREFIX_DEST.  See EnvSnapshot for `prefix` and `environ`"""
+    def __init__(self, prefix="", environ=None):
+        self.prefix = prefix.upper()
+        self.environ = environ
+        self.name = 'env'
+
+    def load(self):
+        env = EnvSnapshot(self.environ, self.prefix)
+        return dict((key[len(self.prefix):], env[key]) for key in env)
+
+    def source_name(self, key):
+        return 'env:%s%s' % (self.prefix, key)
+
+
+class LayeredDefaults(object):
+    """Resolves defaults from a list of layers, like ConfigFile and EnvVars,
+    ordered from highest to lowest precedence.  See the module docstring.
+
+    A layer is any object with a `name` and a `load()` method that returns a
+    {key: value} dict.
+    """
+    def __init__(self, layers):
+        self.layers = list(layers)
+        self._resolved = None
+
+    def _resolve(self):
+        if self._resolved is None:
+            resolved = {}
+            for layer in reversed(self.layers):
+                source_name = getattr(layer, 'source_name', None)
+                for key, value in layer.load().items():
+                    resolved[_normalize(key)] = (
+                        value, source_name(key) if source_name else layer.name)
+            self._resolved = resolved
+        return self._resolved
+
+    def reload(self):
+        """Read the layers again the next time a default is looked up"""
+        self._resolved = None
+
+    def __contains__(self, dest):
+        return _normalize(dest) in self._resolve()
+
+    def get(self, dest, default=None):
+        """Return the value of `dest` from the highest-precedence layer that
+        defines it, or `default`"""
+        return self._resolve().get(_normalize(dest), (default, None))[0]
+
+    def source(self, dest):
+        """Return the name of the layer that `dest`'s default comes from, or
+        'default' if no layer defines it"""
+        return self._resolve().get(_normalize(dest), (None, 'default'))[1]
+
+    def sources(self):
+        """Return a {key: layer name} dict for every key the layers define"""
+        return dict((k, v[1]) for k, v in self._resolve().items())
+
+
+class DefaultFromConfig(argparse.Action):
+    """Define argument options that fetch defaults from a LayeredDefaults
+
+        add_argument("--optA", action=DefaultFromConfig, config=config)
+            --> default is the value of opta in the highest precedence layer
+                of config that defines it, or None
+
+        add_argument("--optB", action=DefaultFromConfig, config=config,
+                     type=int, default=1, required=True)
+            --> uses default=1 if no layer defines optb.  If a layer defines
+                optb, the option is no longer required on the command-line
+
+    String values are converted with the argument's type, nargs and choices,
+    as DefaultFromEnv does.  Other values, like lists and numbers from json
+    or yaml files, are converted from their str(), item by item for lists,
+    as if they were given on the command-line: with the argument's type, or
+    to strings if it has none.  So a value gives the same default whether it
+    comes from a config file or an environment variable.  Lists are only
+    valid for arguments that take many values.  Invalid values raise
+    ConfigValueInvalid when the parser is built.
+    """
+    def __init__(self, config, env_delimiter=",", **kwargs):
+        # so that argparse_tools.cache can read the default again
+        init_kwargs = dict(kwargs, config=config, env_delimiter=env_delimiter)
+        kwargs = kwargs.copy()
+        _check_default_type(kwargs)
+        dest = kwargs['dest']
+        if dest in config:
+            value = config.get(dest)
+            try:
+                if isinstance(value, str):
+                    value = _coerce_env_value(
+                        dest, value, kwargs, env_delimiter)
+                elif value is not None:
+                    # ie lists and numbers from json or yaml files
+                    if not isinstance(value, (list, tuple)):
+                        values = [value]
+                    elif _takes_many(kwargs.get('nargs')):
+                        values = list(value)
+                    else:
+                        raise EnvironmentVarInvalid(
+                            "%s=%r: expected one value" % (dest, value))
+                    value = _coerce_values(dest, value, values, kwargs)
+            except EnvironmentVarInvalid as err:
+                raise ConfigValueInvalid(
+                    "%s (from %s)" % (err, config.source(dest)))
+            kwargs['default'] = value
+            if kwargs.get('required'):
+                kwargs['required'] = False
+        super(DefaultFromConfig, self).__init__(**kwargs)
+        self._init_kwargs = init_kwargs
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
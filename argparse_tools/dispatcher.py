@@ -0,0 +1,105 @@
+"""
+Dispatch many command-lines to subcommand handlers with one parser tree, ie in
+a long-running daemon or REPL.
+
+    dispatcher = Dispatcher([
+        add_argument('--verbose', action='store_true'),
+        add_subparsers({
+            'train': [add_argument('--epochs', type=int)],
+            'predict': 'mypkg.cmds.predict:build_arg_parser',
+        }, lazy=True),
+    ], handlers={'train': train_main})
+
+    dispatcher(['train', '--epochs', '3'])  # --> train_main(ns)
+    dispatcher(['predict'])  # --> mypkg.cmds.predict.main(ns)
+
+The parser tree is built once.  Each call parses into its own namespace and
+never modifies the shared parsers, so a Dispatcher can be called concurrently
+from many threads or asyncio tasks.  Lazy subcommands are built once, by
+whichever call needs them first.
+"""
+import argparse
+import functools
+
+import argparse_tools as at
+
+# namespace attribute that records the chosen subcommand path, ie "a b"
+COMMAND_DEST = '_dispatcher_command'
+
+
+class Dispatcher(object):
+    """Builds a parser once and dispatches parsed command-lines to handlers.
+    See the module docstring.
+
+    `funcs` - list of funcs to pass to build_arg_parser, or a
+              build_arg_parser(funcs) closure
+    `handlers` - dict mapping subcommand paths (ie "train", or "model train"
+                 for nested subcommands) to a main(ns) function.  Subcommands
+                 defined by a module path default to that module's main(ns).
+    `default` - None or the main(ns) function used when no subcommand is
+                chosen or no handler matches
+    `build_kwargs` - passed to build_arg_parser.  By default, the parser
+                     raises ParseError rather than exiting on invalid input
+    """
+    def __init__(self, funcs, handlers=None, default=None, **build_kwargs):
+        funcs = getattr(funcs, 'funcs', funcs)
+        build_kwargs.setdefault('raise_errors', True)
+        # the namespace is frozen once the subcommand path is removed from it
+        self.frozen = build_kwargs.pop('frozen', False) \
+            or bool(build_kwargs.get('parse_cache_size'))
+        self.parser = at.build_arg_parser(funcs, **build_kwargs)()
+        self.handlers = dict(handlers or {})
+        self.default = default
+        self._tag_subcommands(self.parser, ())
+
+    def _tag_subcommands(self, parser, path):
+        """Make each subparser record its path in the namespace"""
+        for action in parser._actions:
+            if not isinstance(action, argparse._SubParsersAction):
+                continue
+            pending = getattr(action.choices, '_pending', {})
+            for name, subparser in dict.items(action.choices):
+                subpath = path + (name, )
+                subparser.set_defaults(**{COMMAND_DEST: ' '.join(subpath)})
+                if name in pending:
+                    pending[name] = functools.partial(
+                        self._build_and_tag, pending[name], subpath)
+                else:
+                    self._tag_subcommands(subparser, subpath)
+
+    def _build_and_tag(self, build, path, parser):
+        build(parser)
+        self._tag_subcommands(parser, path)
+
+    def parse(self, argv):
+        """Parse argv and return (handler, namespace)"""
+        ns = self.parser.parse_args(list(argv))
+        if isinstance(ns, at.FrozenNamespace):
+            # a cached result
+            ns = argparse.Namespace(**ns._asdict())
+        command = vars(ns).pop(COMMAND_DEST, None)
+        if self.frozen:
+            ns = at.freeze(ns)
+        handler = self.handlers.get(command)
+        if handler is None and getattr(ns, at.MAIN_DEST, None):
+            handler = at.dispatch
+        if handler is None:
+            handler = self.default
+        if handler is None:
+            raise at.ParseError(
+                "No handler for subcommand: %s" % command, argv=list(argv))
+        return handler, ns
+
+    def __call__(self, argv):
+        """Parse argv and return the result of calling its handler with the
+        namespace"""
+        handler, ns = self.parse(argv)
+        return handler(ns)
+
+    async def dispatch_async(self, argv):
+        """Like calling the Dispatcher, but awaits the handler's result if
+        the handler is a coroutine function"""
+        rv = self(argv)
+        if hasattr(rv, '__await__'):
+            rv = await rv
+        return rv
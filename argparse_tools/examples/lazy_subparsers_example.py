@@ -0,0 +1,19 @@
+from argparse_tools.examples import shared as at
+
+
+# runthis and runthat are only imported if they are the chosen subcommand
+build_arg_parser = at.build_arg_parser([
+    at.add_subparsers({
+        "runthis": "argparse_tools.examples.runthis:build_arg_parser",
+        "runthat": "argparse_tools.examples.runthat:build_arg_parser"},
+        subcommand_help={
+            "runthis": "run the runthis example",
+            "runthat": "run the runthat example"})
+])
+
+main = at.dispatch
+
+
+if __name__ == '__main__':
+    NS = build_arg_parser().parse_args()
+    main(NS)
@@ -0,0 +1,105 @@
+"""
+Optional instrumentation of argparse_tools, to find out which funcs,
+subparsers or groups make a CLI slow.
+
+    with Instrumentation() as report:
+        parser = build_arg_parser(funcs)()
+        parser.parse_args(argv)
+    print(report.to_json())
+
+While an Instrumentation is active, it records the wall time and the number
+of allocated memory blocks of:
+
+    - every func applied by build_arg_parser and group  (kind='build')
+    - every subparser built by add_subparsers  (kind='subparser')
+    - every parse_known_args/parse_args call  (kind='parse')
+    - every rendering of the help or usage  (kind='help' or 'usage')
+    - every environment lookup by DefaultFromEnv  (kind='env')
+
+Records are nested, so a record's `path` lists the records that contain it.
+When no Instrumentation is active, argparse_tools only pays for an `is None`
+check.  Instrumentation is process-wide and not meant for multi-threaded use.
+"""
+import sys
+import time
+
+import argparse_tools
+
+
+def _func_name(func):
+    """Return a readable name for a func passed to build_arg_parser"""
+    if isinstance(func, argparse_tools.Spec):
+        return func.name
+    while hasattr(func, 'func') and hasattr(func, 'keywords'):
+        func = func.func
+    return getattr(func, '__qualname__', None) or repr(func)
+
+
+class Instrumentation(object):
+    """Records where time goes in argparse_tools.  See the module docstring.
+
+    `callback` - None or a function that receives each record (a dict) as
+                 soon as it is recorded
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self._stack = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = argparse_tools._instrumentation
+        argparse_tools._instrumentation = self
+        return self
+
+    def __exit__(self, *exc_info):
+        argparse_tools._instrumentation = self._previous
+
+    def record(self, kind, name, func, *args, **kwargs):
+        """Call func(*args, **kwargs), record how long it took and return its
+        result"""
+        self._stack.append(name)
+        path = '/'.join(str(n) for n in self._stack)
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            rec = {
+                'kind': kind,
+                'name': name,
+                'path': path,
+                'depth': len(self._stack) - 1,
+                'seconds': time.perf_counter() - start,
+                'allocated_blocks': sys.getallocatedblocks() - blocks,
+            }
+            self._stack.pop()
+            self.records.append(rec)
+            if self.callback is not None:
+                self.callback(rec)
+
+    def record_func(self, func, parser):
+        """Apply one of the funcs passed to build_arg_parser"""
+        return self.record('build', _func_name(func), func, parser)
+
+    def summary(self):
+        """Return a list of {kind, name, count, seconds, allocated_blocks},
+        totalled for each (kind, name) and sorted by total seconds"""
+        totals = {}
+        for rec in self.records:
+            key = (rec['kind'], rec['name'])
+            if key not in totals:
+                totals[key] = {'kind': rec['kind'], 'name': rec['name'],
+                               'count': 0, 'seconds': 0.0,
+                               'allocated_blocks': 0}
+            totals[key]['count'] += 1
+            totals[key]['seconds'] += rec['seconds']
+            totals[key]['allocated_blocks'] += rec['allocated_blocks']
+        return sorted(totals.values(), key=lambda t: -t['seconds'])
+
+    def as_dict(self):
+        return {'records': self.records, 'summary': self.summary()}
+
+    def to_json(self, **kwargs):
+        import json
+        return json.dumps(self.as_dict(), **kwargs)
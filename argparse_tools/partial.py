@@ -0,0 +1,179 @@
+"""
+Parse a few options without building the whole parser.
+
+A wrapper often needs one or two options, like --config or --log-level,
+before it decides what else to build.  parse_partial() picks the arguments
+with the requested dests out of a list of funcs, builds a small parser with
+only those arguments, and returns the parsed namespace and the rest of argv:
+
+    ns, rest = parse_partial(FUNCS, ['config', 'version'])
+    # --version prints the version and exits here, before FUNCS are built
+    config = load(ns.config)
+    ns = build_arg_parser(FUNCS)().parse_args()
+
+Only the arguments before the first positional argument, subcommand or "--"
+are parsed, like the full parser would parse them.  Subcommands aren't built,
+so their options can't be parsed this way.  Plain functions are called with a
+stand-in for a parser that only records their arguments.  Abbreviations of
+the options aren't recognized, and the options are never required, since the
+full parser checks that later.
+"""
+import argparse
+import re
+import sys
+
+import argparse_tools as at
+from argparse_tools.validate import _FakeParser
+
+# actions that take no values on the command-line
+_FLAG_ACTIONS = (
+    argparse._StoreConstAction, argparse._AppendConstAction,
+    argparse._CountAction, argparse._HelpAction, argparse._VersionAction,
+    argparse.BooleanOptionalAction)
+_FLAG_ACTION_NAMES = frozenset([
+    'store_const', 'store_true', 'store_false', 'append_const', 'count',
+    'help', 'version'])
+# argparse's pattern for arguments that are negative numbers, not options
+_NEGATIVE_NUMBER = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
+
+class _NullParser(object):
+    """Ignores every call made on it, ie to build subcommands"""
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return self
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+
+class _Collector(object):
+    """Collects the arguments added to a _PartialParser"""
+    def __init__(self):
+        self.specs = []
+
+    def add_help(self, scope):
+        pass
+
+    def add_argument(self, scope, spec):
+        self.specs.append(spec)
+
+
+class _PartialParser(_FakeParser):
+    def add_subparsers(self, **kwargs):
+        return _NullParser()
+
+
+def _top_level_arguments(funcs):
+    """Return the ArgumentSpecs of the top-level arguments in funcs"""
+    collector = _Collector()
+    parser = _PartialParser(collector, ())
+    for func in funcs:
+        if func and not isinstance(func, at.SubparsersSpec):
+            func(parser)
+    return collector.specs
+
+
+def find_arguments(funcs, dests):
+    """Return the ArgumentSpecs of the top-level options in funcs that have
+    one of the given dests, skipping subcommands.
+
+    Raise a ValueError if a dest isn't defined, or isn't an option
+    """
+    return _find(_top_level_arguments(funcs), dests)
+
+
+def _find(all_specs, dests):
+    dests = set(dests)
+    specs = [spec for spec in all_specs if spec.dest in dests]
+    missing = dests.difference(spec.dest for spec in specs)
+    if missing:
+        raise ValueError(
+            "No options with dests: %s" % ', '.join(sorted(missing)))
+    positional = [spec.dest for spec in specs if not spec.option_strings]
+    if positional:
+        raise ValueError(
+            "Can't partially parse positional arguments: %s"
+            % ', '.join(positional))
+    return specs
+
+
+def _nargs(spec):
+    """Return the nargs of an option, or 0 if it takes no values"""
+    action = spec.kwargs.get('action')
+    if action in _FLAG_ACTION_NAMES or isinstance(action, type) \
+            and issubclass(action, _FLAG_ACTIONS):
+        return 0
+    return spec.kwargs.get('nargs')
+
+
+def _options_end(args, specs, prefix_chars):
+    """Return the index of the first argument in args that is a positional
+    argument, a subcommand or "--".  `specs` are the top-level arguments,
+    whose nargs tell which arguments are the values of options.  Unknown
+    options are assumed to take no values"""
+    nargs = {}
+    for spec in specs:
+        for option_string in spec.option_strings:
+            nargs[option_string] = _nargs(spec)
+
+    def is_option(arg):
+        return len(arg) > 1 and arg[0] in prefix_chars \
+            and not _NEGATIVE_NUMBER.match(arg)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--' or not is_option(arg):
+            return i
+        i += 1
+        option_string, sep, _ = arg.partition('=')
+        if sep or option_string not in nargs:
+            # ie --opt=value, -xVALUE or an unknown option
+            continue
+        n = nargs[option_string]
+        if n == argparse.REMAINDER:
+            return len(args)
+        elif n is None:
+            n = 1
+        elif n in ('?', '*', '+'):
+            # take values up to the next option, like argparse does
+            limit = i + 1 if n == '?' else len(args)
+            j = i
+            while j < limit and j < len(args) and args[j] != '--' \
+                    and not is_option(args[j]):
+                j += 1
+            n = j - i
+        i += n
+    return i
+
+
+def parse_partial(funcs, dests, args=None, **argument_parser_kwargs):
+    """Parse only the options with the given dests and return a
+    (namespace, remaining args) tuple, like parse_known_args.
+    See the module docstring.
+
+    `funcs` - list of funcs to pass to build_arg_parser, or a
+              build_arg_parser(funcs) closure
+    `dests` - the dests of the options to parse
+    `args` - list of arguments to parse.  Defaults to sys.argv[1:]
+    `argument_parser_kwargs` - passed to build_arg_parser
+    """
+    funcs = getattr(funcs, 'funcs', funcs)
+    all_specs = _top_level_arguments(funcs)
+    specs = []
+    for spec in _find(all_specs, dests):
+        kwargs = dict(spec.kwargs)
+        kwargs.pop('required', None)
+        specs.append(at.ArgumentSpec(spec.args, kwargs))
+    argument_parser_kwargs.setdefault('add_help', False)
+    argument_parser_kwargs.setdefault('allow_abbrev', False)
+    parser = at.build_arg_parser(specs, **argument_parser_kwargs)()
+    args = list(sys.argv[1:] if args is None else args)
+    end = _options_end(
+        args, all_specs, argument_parser_kwargs.get('prefix_chars', '-'))
+    ns, rest = parser.parse_known_args(args[:end])
+    return ns, rest + args[end:]
@@ -0,0 +1,215 @@
+"""
+A fork server that runs a CLI without paying for interpreter start, imports
+and parser construction on every call.
+
+The server imports a CLI module once, builds its parser and renders its help,
+then forks a child process for each command-line it receives over a Unix
+socket.  The child takes over the caller's stdin, stdout, stderr, environment
+and working directory, parses the command-line, calls the module's main(ns)
+and reports its exit code.  Use argparse_tools.client to send command-lines:
+
+    $ python -m argparse_tools.server mypkg.cli:build_arg_parser \\
+        /tmp/mycli.sock --prog mycli &
+    $ python -S /path/to/argparse_tools/client.py /tmp/mycli.sock --opt 1
+
+The target is a module path to a parser, or to a function (ie a
+build_arg_parser closure) that returns one.  main(ns) is looked up in the
+same module.
+
+Defaults are computed when the parser is built.  If the caller's environment
+gives a DefaultFromEnv argument a different value than the server's, the
+child imports the CLI module again so that its defaults are right.  Restart
+the server when the CLI's code or config files change.  Posix only.
+"""
+import argparse
+import importlib
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+import argparse_tools as at
+
+# how many connections may wait to be accepted
+BACKLOG = 128
+
+
+def _load(target):
+    """Import the CLI and return (parser, main)"""
+    parser = at._import_target(target)
+    if not isinstance(parser, argparse.ArgumentParser):
+        parser = parser()
+    main = at._import_target('%s:main' % target.partition(':')[0])
+    return parser, main
+
+
+def env_keys(parser):
+    """Return the env vars that DefaultFromEnv arguments of a parser and its
+    built subparsers read their defaults from"""
+    keys = set()
+    for action in parser._actions:
+        if isinstance(action, at.DefaultFromEnv):
+            keys.add(action.env_key)
+        elif isinstance(action, argparse._SubParsersAction):
+            choices = action.choices
+            pending = getattr(choices, '_pending', {})
+            for name, subparser in dict.items(choices):
+                if name not in pending:
+                    keys.update(env_keys(subparser))
+    return keys
+
+
+def decode_request(payload):
+    """The inverse of argparse_tools.client.encode_request"""
+    fields = [os.fsdecode(field) for field in payload.split(b'\0')]
+    cwd, argc = fields[0], int(fields[1])
+    argv = fields[2:2 + argc]
+    env = dict(field.partition('=')[::2] for field in fields[2 + argc:])
+    return argv, env, cwd
+
+
+def _recv_exactly(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(min(n - len(data), 1 << 16))
+        if not chunk:
+            raise EOFError("Client disconnected")
+        data += chunk
+    return data
+
+
+def _exit_code(err):
+    """Return the exit code of a SystemExit, like the interpreter does"""
+    if err.code is None:
+        return 0
+    if isinstance(err.code, int):
+        return err.code
+    sys.stderr.write('%s\n' % err.code)
+    return 1
+
+
+def _run(conn, target, parser, main, server_env, keys):
+    """Run one command-line in a forked child and return its exit code"""
+    header, fds, _, _ = socket.recv_fds(conn, 8, 3)
+    payload = _recv_exactly(conn, struct.unpack('!Q', header)[0])
+    argv, env, cwd = decode_request(payload)
+    conn.sendall(struct.pack('!i', os.getpid()))
+
+    for fd, std_fd in zip(fds, (0, 1, 2)):
+        os.dup2(fd, std_fd)
+        os.close(fd)
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(
+        1, 'w', closefd=False, buffering=1 if os.isatty(1) else -1)
+    sys.stderr = open(2, 'w', closefd=False, buffering=1)
+    os.environ.clear()
+    os.environ.update(env)
+    os.chdir(cwd)
+    sys.argv[1:] = argv
+
+    try:
+        if any(env.get(key) != server_env.get(key) for key in keys):
+            # defaults from env vars were computed with the server's env
+            importlib.reload(importlib.import_module(
+                target.partition(':')[0]))
+            parser, main = _load(target)
+        main(parser.parse_args(argv))
+        code = 0
+    except SystemExit as err:
+        code = _exit_code(err)
+    except KeyboardInterrupt:
+        code = 128 + signal.SIGINT
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (IOError, OSError):
+            pass
+    return code
+
+
+def _terminate(signum, frame):
+    sys.exit(0)
+
+
+def serve(target, socket_path, prog=None):
+    """Import and build the CLI at module path `target`, then handle
+    command-lines sent to `socket_path` until interrupted.
+    See the module docstring.
+
+    `prog` - the program name that the CLI's usage and errors show
+    """
+    if prog is not None:
+        sys.argv[0] = prog
+    parser, main = _load(target)
+    at.prerender_help(parser)
+    server_env = dict(os.environ)
+    keys = env_keys(parser)
+
+    # bind to a temporary name, so the socket only appears once it accepts
+    # connections
+    tmp_path = '%s.%s.tmp' % (socket_path, os.getpid())
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)
+    try:
+        sock.bind(tmp_path)
+    finally:
+        os.umask(umask)
+    sock.listen(BACKLOG)
+    os.rename(tmp_path, socket_path)
+    # forked children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # remove the socket when terminated
+    signal.signal(signal.SIGTERM, _terminate)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        while True:
+            conn, _ = sock.accept()
+            if os.fork():
+                conn.close()
+                continue
+            code = 1
+            try:
+                sock.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                code = _run(conn, target, parser, main, server_env, keys)
+                conn.sendall(struct.pack('!i', code))
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+    finally:
+        sock.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+build_arg_parser = at.build_arg_parser([
+    at.add_argument(
+        'target', help=(
+            'module path of the parser to serve, like'
+            ' "mypkg.cli:build_arg_parser".  It may point to a parser, or to'
+            ' a function that returns one.  The module must define main(ns)')),
+    at.add_argument('socket_path', help='path of the Unix socket to create'),
+    at.add_argument('--prog', help='name of the command'),
+], description=(
+    'Serve a CLI over a Unix socket, forking a pre-built copy of it for each'
+    ' command-line.  Send command-lines with argparse_tools/client.py'))
+
+
+def main(ns):
+    try:
+        serve(ns.target, ns.socket_path, ns.prog)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    NS = build_arg_parser().parse_args()
+    main(NS)
@@ -0,0 +1,177 @@
+"""
+Find conflicts in a spec without building it with argparse.
+
+When shared funcs are composed into one CLI, argparse only raises on the first
+duplicate option string it meets, part way through building the parser, and
+it never notices when two DefaultFromEnv options read the same env var.
+find_conflicts() indexes the option strings, dests and env vars of every
+argument in a list of funcs (specs or plain functions, including nested
+groups and subparsers) in one linear pass, and returns every conflict:
+
+    - 'option': an option string is defined twice in the same (sub)parser
+    - 'dest': two arguments in the same (sub)parser get the same implicit dest
+    - 'shadowed dest': a subparser argument's dest overwrites the dest of an
+      argument of a parent parser
+    - 'env': DefaultFromEnv arguments with different dests read the same env
+      var
+
+Plain functions are called with a lightweight stand-in for a parser that
+only records their calls.  Subcommands given as module paths aren't imported,
+so they aren't checked.
+"""
+import collections
+
+import argparse_tools as at
+
+Conflict = collections.namedtuple('Conflict', 'kind key locations')
+
+
+class SpecConflictError(Exception):
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super(SpecConflictError, self).__init__(
+            "Found %s conflicts:\n%s" % (len(conflicts), '\n'.join(
+                '  %s %r: %s' % (c.kind, c.key, ', '.join(c.locations))
+                for c in conflicts)))
+
+
+class _Collector(object):
+    """Indexes the arguments added to a tree of _FakeParsers"""
+    def __init__(self, prog):
+        self.prog = prog
+        self.options = collections.OrderedDict()
+        self.dests = collections.OrderedDict()
+        self.env_keys = collections.OrderedDict()
+
+    def location(self, scope, spec):
+        return '%s: %s' % (' '.join((self.prog, ) + scope).strip(), spec)
+
+    def add_help(self, scope):
+        for option_string in ('-h', '--help'):
+            self.options.setdefault((scope, option_string), []).append(
+                self.location(scope, 'help'))
+
+    def add_argument(self, scope, spec):
+        loc = self.location(scope, spec)
+        for option_string in spec.option_strings:
+            self.options.setdefault((scope, option_string), []).append(loc)
+        dest = spec.dest
+        self.dests.setdefault((scope, dest), []).append(
+            (loc, 'dest' in spec.kwargs))
+        action = spec.kwargs.get('action')
+        if isinstance(action, type) and issubclass(action, at.DefaultFromEnv):
+            key = ('%s%s' % (spec.kwargs.get('env_prefix', ''), dest)).upper()
+            self.env_keys.setdefault(key, collections.OrderedDict()) \
+                .setdefault(dest, []).append(loc)
+
+    def conflicts(self):
+        rv = []
+        for (scope, option_string), locs in self.options.items():
+            if len(locs) > 1:
+                rv.append(Conflict('option', option_string, locs))
+        scope_dests = {}
+        for (scope, dest), entries in self.dests.items():
+            scope_dests.setdefault(scope, set()).add(dest)
+            implicit = [loc for loc, explicit in entries if not explicit]
+            if len(implicit) > 1:
+                rv.append(Conflict('dest', dest, implicit))
+        for (scope, dest), entries in self.dests.items():
+            for i in range(len(scope)):
+                parent = scope[:i]
+                if dest in scope_dests.get(parent, ()):
+                    rv.append(Conflict('shadowed dest', dest, [
+                        self.dests[(parent, dest)][0][0], entries[0][0]]))
+        for key, dests in self.env_keys.items():
+            if len(dests) > 1:
+                rv.append(Conflict('env', key, [
+                    locs[0] for locs in dests.values()]))
+        return rv
+
+
+class _FakeLazyParserMap(object):
+    """Stands in for the _LazyParserMap of a _FakeSubparsers"""
+    def __init__(self, subparsers):
+        self._subparsers = subparsers
+
+    def defer(self, name, build):
+        if getattr(build, 'func', None) is at._build_from_target:
+            return
+        build(self._subparsers.parsers[name])
+
+
+class _FakeSubparsers(object):
+    def __init__(self, collector, scope):
+        self._collector = collector
+        self._scope = scope
+        self.parsers = {}
+
+    @property
+    def choices(self):
+        return _FakeLazyParserMap(self)
+
+    @choices.setter
+    def choices(self, value):
+        pass
+
+    def add_parser(self, name, **kwargs):
+        parser = _FakeParser(self._collector, self._scope + (name, ))
+        if kwargs.get('add_help', True):
+            self._collector.add_help(parser._scope)
+        self.parsers[name] = parser
+        return parser
+
+    def __getattr__(self, name):
+        return _ignore
+
+
+def _ignore(*args, **kwargs):
+    pass
+
+
+class _FakeParser(object):
+    """Stands in for an argparse parser or argument group, and records the
+    arguments added to it"""
+    def __init__(self, collector, scope):
+        self._collector = collector
+        self._scope = scope
+
+    def add_argument(self, *args, **kwargs):
+        self._collector.add_argument(
+            self._scope, at.ArgumentSpec(args, kwargs))
+
+    def add_argument_group(self, *args, **kwargs):
+        return self
+
+    def add_mutually_exclusive_group(self, *args, **kwargs):
+        return self
+
+    def add_subparsers(self, **kwargs):
+        return _FakeSubparsers(self._collector, self._scope)
+
+    def __getattr__(self, name):
+        return _ignore
+
+
+def find_conflicts(funcs, add_help=True, prog=''):
+    """Return a list of every Conflict in a list of funcs that would be
+    passed to build_arg_parser.  See the module docstring.
+
+    `add_help` - whether the top-level parser will have -h/--help
+    `prog` - name of the top-level parser, used in the Conflict locations
+    """
+    collector = _Collector(prog)
+    if add_help:
+        collector.add_help(())
+    parser = _FakeParser(collector, ())
+    for func in funcs:
+        if func:
+            func(parser)
+    return collector.conflicts()
+
+
+def check_conflicts(funcs, **kwargs):
+    """Raise a SpecConflictError listing every conflict in funcs, if any.
+    `kwargs` are passed to find_conflicts"""
+    conflicts = find_conflicts(funcs, **kwargs)
+    if conflicts:
+        raise SpecConflictError(conflicts)
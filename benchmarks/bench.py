@@ -0,0 +1,256 @@
+"""
+Benchmarks for argparse_tools.
+
+Generates synthetic CLI specs and reports, for each one, the time to build the
+parser, parse_args, and format_help, plus the peak memory allocated while
+building.  Also reports the import time of argparse_tools itself.
+
+Only the original argparse_tools api is used to define the specs, so results
+from different versions of argparse_tools can be compared:
+
+    $ PYTHONPATH=. python benchmarks/bench.py --output before.json
+    $ git checkout my-branch
+    $ PYTHONPATH=. python benchmarks/bench.py --output after.json \
+        --compare before.json
+"""
+import functools
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import argparse_tools as at
+
+
+def flat_spec(n):
+    """n independent options"""
+    return [at.add_argument('--opt%s' % i, default=i) for i in range(n)]
+
+
+def grouped_spec(n):
+    """n options, in argument groups of 10 that each contain a mutually
+    exclusive pair"""
+    funcs = []
+    for g in range(0, n, 10):
+        funcs.append(at.group(
+            'group %s' % g,
+            at.mutually_exclusive(
+                at.add_argument('--opt%s' % g, action='store_true'),
+                at.add_argument('--opt%s' % (g + 1), action='store_true')),
+            *[at.add_argument('--opt%s' % i, type=int, default=i)
+              for i in range(g + 2, min(g + 10, n))]))
+    return funcs
+
+
+def env_spec(n):
+    """n options whose defaults come from environment variables, half of
+    which are defined"""
+    for i in range(0, n, 2):
+        os.environ['BENCH_OPT%s' % i] = str(i)
+    return [at.add_argument(
+        '--opt%s' % i, action=at.DefaultFromEnv, env_prefix='bench_')
+        for i in range(n)]
+
+
+def subparser_spec(n, depth=2, options=10, **kwargs):
+    """A tree of subparsers `depth` levels deep, with n subcommands at the top
+    level, 3 at each lower level, and `options` options per subcommand.
+    `kwargs` are passed to add_subparsers"""
+    def _level(d, fanout):
+        funcs = [at.add_argument('--level%s_opt%s' % (d, i))
+                 for i in range(options)]
+        if d < depth:
+            dct = dict(('cmd%s' % i, _level(d + 1, 3)) for i in range(fanout))
+            funcs.append(at.add_subparsers(dct, **kwargs))
+        return funcs
+    return _level(1, n)
+
+
+def _first_subcommand_argv(parser):
+    argv = []
+    while parser._subparsers is not None:
+        action = parser._subparsers._group_actions[0]
+        name = sorted(action.choices)[0]
+        argv.append(name)
+        parser = action.choices[name]
+    return argv
+
+
+def _render_help(parser):
+    # time rendering the help, not a lookup in the parser's help cache
+    if hasattr(parser, 'invalidate_help_cache'):
+        parser.invalidate_help_cache()
+    return parser.format_help()
+
+
+def _time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run_case(name, make_funcs, size, repeat):
+    # cases like env_spec modify the environment
+    environ = dict(os.environ)
+    try:
+        return _run_case(name, make_funcs, size, repeat)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def _run_case(name, make_funcs, size, repeat):
+    funcs = make_funcs(size)
+    build_kwargs = BUILD_KWARGS.get(name, dict)()
+
+    def build():
+        return at.build_arg_parser(funcs, **build_kwargs)()
+    # with a cache_dir, this first build populates the cache, and the timed
+    # builds load from it
+    tracemalloc.start()
+    parser = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    argv = _first_subcommand_argv(parser)
+    try:
+        return {
+            'case': name,
+            'size': size,
+            'build_seconds': _time(build, repeat),
+            'parse_seconds': _time(lambda: parser.parse_args(argv), repeat),
+            'help_seconds': _time(lambda: _render_help(parser), repeat),
+            'build_peak_bytes': peak,
+        }
+    finally:
+        if 'cache_dir' in build_kwargs:
+            shutil.rmtree(build_kwargs['cache_dir'])
+
+
+def import_time(repeat):
+    """Return the cumulative import time, in seconds, of argparse_tools and of
+    the modules it imports, as reported by python -X importtime"""
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import argparse_tools'],
+            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+        for line in out.splitlines():
+            match = re.match(
+                r'import time:\s+\d+ \|\s+(\d+) \|\s*argparse_tools$', line)
+            if match:
+                times.append(int(match.group(1)) / 1e6)
+    return min(times)
+
+
+# cases whose name contains "subparsers" also receive the tree's depth
+CASES = {
+    'flat': flat_spec,
+    'grouped': grouped_spec,
+    'env': env_spec,
+    'subparsers': subparser_spec,
+}
+if 'lazy' in at.add_subparsers.__code__.co_varnames:
+    CASES['lazy_subparsers'] = lambda n, depth: subparser_spec(
+        n, depth, lazy=True)
+if 'threads' in at.add_subparsers.__code__.co_varnames:
+    CASES['threaded_subparsers'] = lambda n, depth: subparser_spec(
+        n, depth, threads=os.cpu_count())
+# case -> function returning the kwargs to pass to build_arg_parser
+BUILD_KWARGS = {}
+if 'cache_dir' in at.build_arg_parser.__code__.co_varnames:
+    CASES['cached'] = flat_spec
+    BUILD_KWARGS['cached'] = lambda: {'cache_dir': tempfile.mkdtemp()}
+
+
+def run(cases, sizes, repeat, depth=2):
+    results = []
+    for name in cases:
+        for size in sizes:
+            make_funcs = CASES[name]
+            if 'subparsers' in name:
+                make_funcs = functools.partial(make_funcs, depth=depth)
+                # nested subparser trees grow much faster than their top level
+                size = max(1, size // 10)
+            row = run_case(name, make_funcs, size, repeat)
+            if 'subparsers' in name:
+                row['depth'] = depth
+            results.append(row)
+    return {
+        'python': platform.python_version(),
+        'argparse_tools': os.path.dirname(at.__file__),
+        'import_seconds': import_time(repeat),
+        'results': results,
+    }
+
+
+def _row_key(row):
+    # results from before --depth existed were all 2 levels deep
+    depth = row.get('depth', 2) if 'subparsers' in row['case'] else None
+    return (row['case'], row['size'], depth)
+
+
+def _fmt_row(row, baseline=None):
+    cols = ['build_seconds', 'parse_seconds', 'help_seconds',
+            'build_peak_bytes']
+    case = row['case']
+    if 'depth' in row:
+        case += ' (depth %s)' % row['depth']
+    rv = '%-29s %6s' % (case, row['size'])
+    for col in cols:
+        rv += ' %12.6g' % row[col]
+        if baseline is not None:
+            rv += ' (%5.2fx)' % (row[col] / float(baseline[col] or 1))
+    return rv
+
+
+def report(data, baseline=None):
+    lines = ['python %s, argparse_tools from %s' % (
+        data['python'], data['argparse_tools'])]
+    lines.append('import argparse_tools: %.6fs' % data['import_seconds'])
+    lines.append('%-29s %6s %12s %12s %12s %12s' % (
+        'case', 'size', 'build (s)', 'parse (s)', 'help (s)', 'peak (B)'))
+    if baseline is not None:
+        lines[1] += ' (%5.2fx)' % (
+            data['import_seconds'] / baseline['import_seconds'])
+        baseline = dict(
+            (_row_key(row), row) for row in baseline['results'])
+    for row in data['results']:
+        lines.append(_fmt_row(row, baseline and baseline.get(_row_key(row))))
+    return '\n'.join(lines)
+
+
+build_arg_parser = at.build_arg_parser([
+    at.add_argument(
+        '--cases', nargs='+', default=sorted(CASES), choices=sorted(CASES)),
+    at.add_argument(
+        '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+        help='number of options to generate.  Try 10000 too'),
+    at.add_argument('--repeat', type=int, default=5),
+    at.add_argument(
+        '--depth', type=int, default=2,
+        help='number of levels of the subparsers cases\' trees'),
+    at.add_argument('--output', help='write the results as json to this file'),
+    at.add_argument(
+        '--compare', help='json results of a previous run to compare with'),
+], description='Benchmark argparse_tools')
+
+
+def main(ns):
+    data = run(ns.cases, ns.sizes, ns.repeat, ns.depth)
+    baseline = None
+    if ns.compare:
+        with open(ns.compare) as fin:
+            baseline = json.load(fin)
+    print(report(data, baseline))
+    if ns.output:
+        with open(ns.output, 'w') as fout:
+            json.dump(data, fout, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    NS = build_arg_parser().parse_args()
+    main(NS)
@@ -1,9 +1,7 @@
 try:
-    from distutils.core import setup
-    from setuptools import find_packages
+    from setuptools import setup, find_packages
 except ImportError:
-    print ("Please install Distutils and setuptools"
-           " before installing this package")
+    print ("Please install setuptools before installing this package")
     raise
 
 setup(
@@ -20,7 +18,8 @@ setup(
 
     packages=find_packages(),
     include_package_data=True,
-    install_requires = ['argparse'],
+    # exit_on_error, socket.send_fds
+    python_requires='>=3.9',
     tests_require=['nose'],
     test_suite="nose.main",
 )
@@ -22,3 +22,86 @@ def test_add_subparsers():
         # http://stackoverflow.com/questions/22990977/
         # /why-does-this-argparse-code-behave-differently-between-python-2-and-3
         ns = p.parse_args(['--opt1', '1'])
+
+
+def test_add_subparsers_lazy():
+    built = []
+
+    def opt(name):
+        def _opt(parser):
+            built.append(name)
+            parser.add_argument('--in_%s_only' % name)
+        return _opt
+
+    p = at.build_arg_parser([
+        at.add_argument('--opt1'),
+        at.add_subparsers({
+            'subparserA': [opt('a')],
+            'subparserB': [opt('b')]},
+            lazy=True, subcommand_help={'subparserA': 'the A command'})
+    ])()
+    # nothing is built until argparse dispatches to a subparser
+    nt.assert_equal(built, [])
+    nt.assert_in('the A command', p.format_help())
+    nt.assert_equal(built, [])
+
+    ns = p.parse_args(['--opt1', '1', 'subparserA', '--in_a_only', 'AAA'])
+    nt.assert_equal(ns, Namespace(opt1='1', in_a_only='AAA'))
+    nt.assert_equal(built, ['a'])
+    # each subparser is only built once
+    p.parse_args(['subparserA'])
+    nt.assert_equal(built, ['a'])
+
+    with nt.assert_raises(SystemExit):
+        p.parse_args(['--opt1', '1', 'subparserA', '--in_b_only'])
+    nt.assert_equal(built, ['a'])
+
+
+def test_add_subparsers_lazy_build_fails():
+    calls = []
+
+    def flaky(parser):
+        calls.append(1)
+        parser.add_argument('--b', default='b')
+        parser.add_argument_group('group').add_argument('--c')
+        parser.set_defaults(d='d')
+        if len(calls) < 3:
+            raise ValueError('failed %s' % len(calls))
+
+    p = at.build_arg_parser([at.add_subparsers(
+        {'sub': [at.add_argument('--a'), flaky]}, lazy=True)])()
+    for i in (1, 2):
+        with nt.assert_raises_regex(ValueError, 'failed %s' % i):
+            p.parse_args(['sub'])
+    # the failed builds left nothing behind
+    ns = p.parse_args(['sub', '--c', 'x'])
+    nt.assert_equal(ns, Namespace(a=None, b='b', c='x', d='d'))
+    nt.assert_equal(len(calls), 3)
+    nt.assert_equal(p.parse_args(['sub']).c, None)
+    nt.assert_equal(len(calls), 3)
+
+
+def test_add_subparsers_threads():
+    def spec(threads):
+        return [at.add_subparsers(dict(
+            ('cmd%s' % i, [at.add_argument('--opt%s' % j, default=j)
+                           for j in range(i)])
+            for i in range(20)), threads=threads)]
+
+    p = at.build_arg_parser(spec(None))()
+    p2 = at.build_arg_parser(spec(4))()
+    nt.assert_equal(p2.format_help(), p.format_help())
+    for i in range(20):
+        argv = ['cmd%s' % i, '--opt0', 'x']
+        if i == 0:
+            argv = argv[:1]
+        nt.assert_equal(p2.parse_args(argv), p.parse_args(argv))
+    nt.assert_equal(list(p2._subparsers._group_actions[0].choices),
+                    ['cmd%s' % i for i in sorted(range(20), key=str)])
+
+    def fail(parser):
+        raise ValueError('failed')
+
+    with nt.assert_raises(ValueError):
+        at.build_arg_parser([at.add_subparsers(
+            {'a': [at.add_argument('--a')], 'b': [fail]}, threads=2)])
@@ -0,0 +1,174 @@
+import argparse_tools as at
+from argparse import Namespace
+from argparse_tools.batch import parse_columns, parse_many, parse_stream
+import array
+import contextlib
+import io
+import itertools
+import os
+import tempfile
+import nose.tools as nt
+
+
+def _parser():
+    return at.build_arg_parser([
+        at.add_argument('--a', type=int, default='1'),
+        at.add_argument('--b', action='append', default=[]),
+        at.add_argument('--c', choices=['x', 'y']),
+        at.add_subparsers({
+            'sub1': [at.add_argument('--in_1', required=True)],
+            'sub2': []}, dest='cmd'),
+    ])()
+
+
+ARGVS = [
+    ['sub2'],
+    ['--a', '2', '--b', 'x', 'sub1', '--in_1', '1'],
+    ['--c', 'z', 'sub2'],
+    ['sub1'],
+    ['--b', 'y', 'sub2'],
+    ['--unknown', 'sub2'],
+]
+
+
+def test_parse_many():
+    rv = list(parse_many(_parser(), iter(ARGVS)))
+    nt.assert_equal(rv[0], Namespace(a=1, b=[], c=None, cmd='sub2'))
+    nt.assert_equal(
+        rv[1], Namespace(a=2, b=['x'], c=None, cmd='sub1', in_1='1'))
+    # mutable defaults are not shared between results
+    nt.assert_equal(rv[4], Namespace(a=1, b=['y'], c=None, cmd='sub2'))
+    nt.assert_equal(rv[0].b, [])
+
+    # errors are returned, not raised
+    for err, argv in [(rv[2], ARGVS[2]), (rv[3], ARGVS[3]),
+                      (rv[5], ARGVS[5])]:
+        nt.assert_is_instance(err, at.ParseError)
+        nt.assert_equal(err.argv, argv)
+    nt.assert_in("invalid choice: 'z'", rv[2].message)
+    nt.assert_in('--in_1', rv[3].message)
+    nt.assert_in('unrecognized arguments: --unknown', rv[5].message)
+
+    # results match parse_args
+    p = _parser()
+    for argv, ns in zip(ARGVS, rv):
+        if not isinstance(ns, at.ParseError):
+            nt.assert_equal(p.parse_args(argv), ns)
+
+
+def test_parse_many_prints_nothing():
+    p = _parser()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        rv = parse_many(p, [['--c', 'z', 'sub2'], ['-h'], ['sub2']])
+        err = next(rv)
+        nt.assert_in("invalid choice: 'z'", err.message)
+        nt.assert_equal(next(rv).message, 'help requested')
+        # the parser exits as usual outside of parse_many, even while the
+        # generator is suspended
+        with nt.assert_raises(SystemExit):
+            p.parse_args(['--c', 'z', 'sub2'])
+        nt.assert_equal(next(rv).cmd, 'sub2')
+    nt.assert_not_in('help requested', out.getvalue())
+    nt.assert_not_in('show this help message', out.getvalue())
+
+
+def test_parse_many_processes():
+    argvs = ARGVS * 50
+    expected = list(parse_many(_parser(), argvs))
+    rv = list(parse_many(_parser(), iter(argvs), processes=2, chunksize=7))
+    nt.assert_equal(len(rv), len(expected))
+    for a, b in zip(rv, expected):
+        if isinstance(b, at.ParseError):
+            nt.assert_equal((a.message, a.argv), (b.message, b.argv))
+        else:
+            nt.assert_equal(a, b)
+
+
+JOBS = """# one job per line
+--a 2 --b 'x y' sub1 --in_1 1
+
+sub2  # trailing comment
+--b "unclosed sub2
+--c z sub2
+"""
+
+
+def test_parse_stream():
+    rv = list(parse_stream(_parser(), io.StringIO(JOBS)))
+    nt.assert_equal([lineno for lineno, _ in rv], [2, 4, 5, 6])
+    nt.assert_equal(
+        rv[0][1], Namespace(a=2, b=['x y'], c=None, cmd='sub1', in_1='1'))
+    nt.assert_equal(rv[1][1], Namespace(a=1, b=[], c=None, cmd='sub2'))
+    nt.assert_is_instance(rv[2][1], at.ParseError)
+    nt.assert_equal(rv[2][1].message, 'line 5: No closing quotation')
+    nt.assert_equal(rv[2][1].argv, ['--b "unclosed sub2'])
+    nt.assert_in("invalid choice: 'z'", rv[3][1].message)
+
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as fout:
+            fout.write(JOBS * 20)
+        rv2 = list(parse_stream(_parser(), path, processes=2, chunksize=3))
+    finally:
+        os.remove(path)
+    nt.assert_equal(len(rv2), 80)
+    nt.assert_equal(rv2[4][0], 8)
+    nt.assert_equal(rv2[4][1], rv[0][1])
+    nt.assert_equal(rv2[6][1].message, 'line 11: No closing quotation')
+
+
+def test_parse_stream_is_lazy():
+    # an endless stream of jobs is only read as far as it is parsed
+    for processes in (None, 2):
+        lines = itertools.cycle(['sub2\n', '--a 3 sub2\n'])
+        rv = list(itertools.islice(
+            parse_stream(_parser(), lines, processes, chunksize=2), 5))
+        nt.assert_equal([ns.a for _, ns in rv], [1, 3, 1, 3, 1])
+
+
+def test_parse_columns():
+    p = at.build_arg_parser([
+        at.add_argument('--a', type=int, default='1'),
+        at.add_argument('--f', type=float),
+        at.add_argument('--v', action='store_true'),
+        at.add_argument('--n', type=int),
+        at.add_argument('--b', action='append', default=[]),
+        at.add_subparsers({
+            'sub1': [at.add_argument('--in_1', type=int, required=True)],
+            'sub2': []}, dest='cmd', lazy=True),
+    ])()
+    argvs = [
+        ['--a', '2', '--f', '1.5', 'sub1', '--in_1', '3'],
+        ['--v', '--b', 'x', 'sub2'],
+        ['--a', 'x', 'sub2'],
+        ['--n', str(2 ** 70), 'sub1', '--in_1', '4'],
+    ]
+    columns, valid, errors = parse_columns(p, iter(argvs))
+    nt.assert_equal(errors[:2] + errors[3:], [None, None, None])
+    nt.assert_is_instance(errors[2], at.ParseError)
+    nt.assert_equal(errors[2].argv, argvs[2])
+
+    nt.assert_equal(columns['a'], array.array('q', [2, 1, 0, 1]))
+    nt.assert_equal(valid['a'], array.array('b', [1, 1, 0, 1]))
+    nt.assert_equal(columns['f'], array.array('d', [1.5, 0, 0, 0]))
+    nt.assert_equal(valid['f'], array.array('b', [1, 0, 0, 0]))
+    nt.assert_equal(columns['v'], array.array('b', [0, 1, 0, 0]))
+    nt.assert_equal(columns['b'], [[], ['x'], None, []])
+    nt.assert_equal(columns['cmd'], ['sub1', 'sub2', None, 'sub1'])
+    # too large for an int64 array
+    nt.assert_equal(columns['n'], [None, None, None, 2 ** 70])
+    nt.assert_equal(valid['n'], array.array('b', [0, 0, 0, 1]))
+    # the lazy subparser wasn't built before parsing, so this is a list
+    nt.assert_equal(columns['in_1'], [3, None, None, 4])
+    nt.assert_equal(valid['in_1'], array.array('b', [1, 0, 0, 1]))
+
+    # the same values as parse_many, where defined
+    for i, ns in enumerate(parse_many(p, argvs)):
+        if isinstance(ns, at.ParseError):
+            continue
+        row = dict(
+            (dest, columns[dest][i] if valid[dest][i] else None)
+            for dest in vars(ns))
+        row['v'] = bool(row['v'])
+        nt.assert_equal(row, vars(ns))
@@ -0,0 +1,120 @@
+import argparse_tools as at
+from argparse import Namespace
+from argparse_tools import cache
+import nose.tools as nt
+import os
+import shutil
+import tempfile
+
+
+class _Calls(object):
+    n = 0
+
+
+def counted_opt(parser):
+    _Calls.n += 1
+    parser.add_argument('--counted', type=int, default=3)
+
+
+def _spec():
+    return [
+        counted_opt,
+        at.group(
+            'a group',
+            at.add_argument('--a', choices=['x', 'y']),
+            at.mutually_exclusive(
+                at.add_argument('--b', action='store_true'),
+                at.add_argument('--c', action='store_true'))),
+        at.add_argument(
+            '--fenv', action=at.DefaultFromEnv, env_prefix='test_cache_'),
+        at.add_subparsers({
+            'sub1': [at.add_argument('--in_1', default='1')],
+            'sub2': [counted_opt]}, lazy=True, dest='cmd'),
+    ]
+
+
+def test_build_cached():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        _Calls.n = 0
+        os.environ['TEST_CACHE_FENV'] = 'from env'
+        p1 = at.build_arg_parser(_spec(), cache_dir=cache_dir)()
+        nt.assert_equal(_Calls.n, 1)
+        nt.assert_equal(len(os.listdir(cache_dir)), 1)
+
+        p2 = at.build_arg_parser(_spec(), cache_dir=cache_dir)()
+        # funcs were not called again
+        nt.assert_equal(_Calls.n, 1)
+        for argv in (['sub2', '--counted', '5'], ['--b', '--a', 'y', 'sub1']):
+            nt.assert_equal(p1.parse_args(argv), p2.parse_args(argv))
+        # lazy subcommands are still built when first used
+        nt.assert_equal(_Calls.n, 3)
+        # the environment is still read when loading from the cache
+        os.environ['TEST_CACHE_FENV'] = 'changed'
+        p3 = at.build_arg_parser(_spec(), cache_dir=cache_dir)()
+        nt.assert_equal(_Calls.n, 3)
+        nt.assert_equal(p3.parse_args(['sub1']).fenv, 'changed')
+        nt.assert_equal(
+            p2.parse_args(['sub1']),
+            Namespace(a=None, b=False, c=False, cmd='sub1', counted=3,
+                      fenv='from env', in_1='1'))
+        with nt.assert_raises(SystemExit):
+            p2.parse_args(['--b', '--c', 'sub1'])
+        nt.assert_equal(p1.format_help(), p2.format_help())
+    finally:
+        os.environ.pop('TEST_CACHE_FENV', None)
+        shutil.rmtree(cache_dir)
+
+
+def test_fingerprint_changes_with_spec():
+    fp = cache.fingerprint([at.add_argument('--a', default=1)])
+    nt.assert_equal(fp, cache.fingerprint([at.add_argument('--a', default=1)]))
+    nt.assert_not_equal(
+        fp, cache.fingerprint([at.add_argument('--a', default=2)]))
+    nt.assert_not_equal(
+        fp, cache.fingerprint([at.add_argument('--b', default=1)]))
+
+    # specs that can't be fingerprinted aren't cached, but still build
+    with nt.assert_raises(cache.Uncacheable):
+        cache.fingerprint([lambda parser: None])
+    cache_dir = tempfile.mkdtemp()
+    try:
+        p = at.build_arg_parser(
+            [at.add_argument('--a', type=lambda x: x)], cache_dir=cache_dir)()
+        nt.assert_equal(p.parse_args(['--a', '1']), Namespace(a='1'))
+        nt.assert_equal(os.listdir(cache_dir), [])
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def uncacheable_opt(parser):
+    parser.add_argument('--u', type=lambda x: int(x))
+
+
+def test_build_cached_reads_env_in_subparsers():
+    spec = [
+        at.add_subparsers({'sub': [
+            at.add_argument('--e', type=int, action=at.DefaultFromEnv,
+                            env_prefix='test_cache_', envrequired=True),
+            at.template(at.add_argument('--t', default=1))]}),
+    ]
+    cache_dir = tempfile.mkdtemp()
+    try:
+        os.environ['TEST_CACHE_E'] = '1'
+        p1 = at.build_arg_parser(spec, cache_dir=cache_dir)()
+        os.environ['TEST_CACHE_E'] = '2'
+        p2 = at.build_arg_parser(spec, cache_dir=cache_dir)()
+        nt.assert_equal(p1.parse_args(['sub']), Namespace(e=1, t=1))
+        nt.assert_equal(p2.parse_args(['sub']), Namespace(e=2, t=1))
+        del os.environ['TEST_CACHE_E']
+        with nt.assert_raises(at.EnvironmentVarRequired):
+            at.build_arg_parser(spec, cache_dir=cache_dir)()
+
+        # parsers that can't be pickled are built without the cache
+        p = at.build_arg_parser([uncacheable_opt], cache_dir=cache_dir)()
+        nt.assert_equal(p.parse_args(['--u', '3']), Namespace(u=3))
+        p = at.build_arg_parser([uncacheable_opt], cache_dir=cache_dir)()
+        nt.assert_equal(p.parse_args(['--u', '3']), Namespace(u=3))
+    finally:
+        os.environ.pop('TEST_CACHE_E', None)
+        shutil.rmtree(cache_dir)
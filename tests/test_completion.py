@@ -0,0 +1,68 @@
+import argparse_tools as at
+from argparse_tools import completion
+import nose.tools as nt
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+def _parser():
+    return at.build_arg_parser([
+        at.add_argument('--verbose', '-v', action='store_true'),
+        at.group(
+            'grp', at.add_argument('--level', choices=['low', 'high'])),
+        at.add_subparsers({
+            'run': [
+                at.mutually_exclusive(
+                    at.add_argument('--fast', action='store_true'),
+                    at.add_argument('--out')),
+                at.add_subparsers({'now': [at.add_argument('--when')]}),
+            ],
+            'stop': [at.add_argument('--force', action='store_true')],
+        }, lazy=True),
+    ])()
+
+
+def test_completion_index():
+    rows = completion.completion_index(_parser())
+    index = dict(((path, kind), words) for path, kind, words in rows)
+    nt.assert_equal(index[('/', 's')], 'run stop')
+    nt.assert_equal(index[('/', 'o')], '-h --help --verbose -v --level')
+    nt.assert_equal(index[('/', 'v')], '--level')
+    nt.assert_equal(index[('/', 'c:--level')], 'low high')
+    nt.assert_equal(index[('/run', 's')], 'now')
+    nt.assert_equal(index[('/run', 'o')], '-h --help --fast --out')
+    nt.assert_equal(index[('/run/now', 'o')], '-h --help --when')
+    nt.assert_equal(index[('/stop', 'v')], '')
+
+
+def _complete(script, *words):
+    cmd = '%s\nCOMP_WORDS=(%s)\nCOMP_CWORD=%s\n' \
+        '_argparse_tools_complete_my_cli\necho "${COMPREPLY[*]}"\n' % (
+            script, ' '.join("'%s'" % w for w in words), len(words) - 1)
+    return subprocess.check_output(
+        ['bash', '-c', cmd], universal_newlines=True).strip()
+
+
+def test_bash_completion():
+    if not shutil.which('bash'):
+        return
+    tmpdir = tempfile.mkdtemp()
+    try:
+        index = os.path.join(tmpdir, 'index')
+        completion.write_index(_parser(), index)
+        script = completion.completion_script('my-cli', index)
+        nt.assert_equal(_complete(script, 'my-cli', ''), 'run stop')
+        nt.assert_equal(_complete(script, 'my-cli', '--le'), '--level')
+        nt.assert_equal(
+            _complete(script, 'my-cli', '--level', ''), 'low high')
+        nt.assert_equal(
+            _complete(script, 'my-cli', '--level', 'run', ''), 'run stop')
+        nt.assert_equal(
+            _complete(script, 'my-cli', '-v', 'run', '--f'), '--fast')
+        nt.assert_equal(
+            _complete(script, 'my-cli', 'run', '--out', 'x', 'now', '--'),
+            '--help --when')
+    finally:
+        shutil.rmtree(tmpdir)
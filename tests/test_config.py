@@ -0,0 +1,125 @@
+import argparse_tools as at
+from argparse import Namespace
+from argparse_tools import config as c
+import json
+import nose.tools as nt
+import os
+import shutil
+import tempfile
+
+
+def test_layered_defaults():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        json_fp = os.path.join(tmpdir, 'conf.json')
+        with open(json_fp, 'w') as fout:
+            json.dump({'workers': 2, 'log-level': 'info', 'hosts': ['a']},
+                      fout)
+        ini_fp = os.path.join(tmpdir, 'conf.ini')
+        with open(ini_fp, 'w') as fout:
+            fout.write('[myapp]\nworkers = 3\nnames = x,y\n')
+
+        config = c.LayeredDefaults([
+            c.EnvVars('myapp_', environ={'MYAPP_LOG_LEVEL': 'debug'}),
+            c.ConfigFile(ini_fp, section='myapp'),
+            c.ConfigFile(json_fp),
+            c.ConfigFile(os.path.join(tmpdir, 'missing.json')),
+        ])
+
+        def opt(*args, **kwargs):
+            return at.add_argument(
+                *args, action=c.DefaultFromConfig, config=config, **kwargs)
+        p = at.build_arg_parser([
+            opt('--workers', type=int, required=True),
+            opt('--log_level'),
+            opt('--hosts', nargs='+'),
+            opt('--names', nargs='+'),
+            opt('--other', default=5),
+        ])()
+        nt.assert_equal(p.parse_args([]), Namespace(
+            workers=3, log_level='debug', hosts=['a'], names=['x', 'y'],
+            other=5))
+        nt.assert_equal(p.parse_args(['--workers', '4']).workers, 4)
+
+        nt.assert_equal(config.source('workers'), 'file:%s' % ini_fp)
+        nt.assert_equal(config.source('log_level'), 'env:MYAPP_LOG_LEVEL')
+        nt.assert_equal(config.source('hosts'), 'file:%s' % json_fp)
+        nt.assert_equal(config.source('other'), 'default')
+
+        # files are parsed once, until they change
+        data = c.load_config_file(json_fp)
+        nt.assert_is(c.load_config_file(json_fp), data)
+        with open(json_fp, 'w') as fout:
+            json.dump({'workers': 'x'}, fout)
+        os.utime(json_fp, ns=(0, 0))
+        nt.assert_equal(c.load_config_file(json_fp), {'workers': 'x'})
+
+        config = c.LayeredDefaults([c.ConfigFile(json_fp)])
+        with nt.assert_raises(c.ConfigValueInvalid):
+            at.build_arg_parser([opt('--workers', type=int)])
+        with nt.assert_raises(IOError):
+            c.LayeredDefaults([
+                c.ConfigFile(os.path.join(tmpdir, 'missing.json'),
+                             required=True)]).get('a')
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+class _Layer(object):
+    name = 'test layer'
+
+    def __init__(self, data):
+        self.data = data
+
+    def load(self):
+        return self.data
+
+
+def test_values_that_arent_strings():
+    config = c.LayeredDefaults([_Layer({
+        'ports': ['1', 2], 'n': 2, 'ratio': 1, 'pair': [1, 2],
+        'bad_n': 3.5, 'bad_ports': ['1', 'x'], 'bad_pair': [1]})])
+
+    def opt(*args, **kwargs):
+        return at.add_argument(
+            *args, action=c.DefaultFromConfig, config=config, **kwargs)
+    p = at.build_arg_parser([
+        opt('--ports', type=int, nargs='+'),
+        opt('--n', type=int, choices=[1, 2]),
+        opt('--ratio', type=float),
+        opt('--pair', nargs=2),
+    ])()
+    ns = p.parse_args([])
+    nt.assert_equal(
+        ns, Namespace(ports=[1, 2], n=2, ratio=1.0, pair=['1', '2']))
+    nt.assert_is_instance(ns.ratio, float)
+
+    for args, kwargs in [
+            (('--bad_n', ), dict(choices=[1, 2])),
+            (('--bad_n', ), dict(type=int)),
+            (('--bad_ports', ), dict(type=int, nargs='+')),
+            (('--bad_pair', ), dict(nargs=2)),
+            (('--pair', ), dict()),
+    ]:
+        with nt.assert_raises(c.ConfigValueInvalid):
+            at.build_arg_parser([opt(*args, **kwargs)])
+
+
+def test_untyped_values_match_env_vars():
+    # untyped options get the strings a command-line or env var would give
+    data = {'n': 2, 'flag': True, 'names': ['a', 1], 'wrapped': 'x'}
+    env = dict((k.upper(), v) for k, v in [
+        ('n', '2'), ('flag', 'True'), ('names', 'a,1'), ('wrapped', 'x')])
+    kwargs = dict(
+        n=dict(), flag=dict(), names=dict(nargs='*'),
+        wrapped=dict(type=lambda s: '<%s>' % s))
+    config = c.LayeredDefaults([_Layer(data)])
+    from_config = at.build_arg_parser([
+        at.add_argument('--' + k, action=c.DefaultFromConfig, config=config,
+                        **kw) for k, kw in kwargs.items()])().parse_args([])
+    from_env = at.build_arg_parser([
+        at.add_argument('--' + k, action=at.DefaultFromEnv, env=env, **kw)
+        for k, kw in kwargs.items()])().parse_args([])
+    nt.assert_equal(from_config, from_env)
+    nt.assert_equal(from_config, Namespace(
+        n='2', flag='True', names=['a', '1'], wrapped='<x>'))
@@ -0,0 +1,66 @@
+import argparse_tools as at
+from argparse_tools.dispatcher import Dispatcher
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import nose.tools as nt
+
+
+def _dispatcher(**kwargs):
+    def train(ns):
+        return ('train', ns.epochs, ns.verbose)
+
+    async def predict(ns):
+        return ('predict', ns.model)
+
+    return Dispatcher([
+        at.add_argument('--verbose', action='store_true'),
+        at.add_subparsers({
+            'train': [at.add_argument('--epochs', type=int, default=1)],
+            'model': [at.add_subparsers({
+                'predict': [at.add_argument('--model')],
+                'list': []}, lazy=True)],
+            'runthat': 'argparse_tools.examples.runthat:build_arg_parser',
+        }, lazy=True),
+    ], handlers={'train': train, 'model predict': predict}, **kwargs)
+
+
+def test_dispatcher():
+    d = _dispatcher(default=lambda ns: 'default')
+    nt.assert_equal(d(['train', '--epochs', '3']), ('train', 3, False))
+    nt.assert_equal(d(['--verbose', 'train']), ('train', 1, True))
+    nt.assert_equal(d(['model', 'list']), 'default')
+    nt.assert_equal(
+        asyncio.run(d.dispatch_async(['model', 'predict', '--model', 'm'])),
+        ('predict', 'm'))
+    # handlers get a clean namespace
+    handler, ns = d.parse(['train'])
+    nt.assert_equal(sorted(vars(ns)), ['epochs', 'verbose'])
+
+    with nt.assert_raises(at.ParseError):
+        d(['train', '--epochs', 'x'])
+    with nt.assert_raises(at.ParseError):
+        _dispatcher()(['model', 'list'])
+
+
+def test_module_path_handlers():
+    d = _dispatcher()
+    handler, ns = d.parse(['runthat', '--custom_arg', '1'])
+    nt.assert_is(handler, at.dispatch)
+    nt.assert_equal(ns.custom_arg, '1')
+
+
+def test_dispatcher_threads():
+    d = _dispatcher()
+    argvs = [['train', '--epochs', str(i)] if i % 2 else
+             ['model', 'predict', '--model', str(i)] for i in range(200)]
+
+    def call(argv):
+        rv = d(argv)
+        if asyncio.iscoroutine(rv):
+            rv = asyncio.run(rv)
+        return rv
+    with ThreadPoolExecutor(8) as pool:
+        rv = list(pool.map(call, argvs))
+    nt.assert_equal(rv, [
+        ('train', i, False) if i % 2 else ('predict', str(i))
+        for i in range(200)])
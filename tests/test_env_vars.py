@@ -2,6 +2,8 @@ import argparse_tools as at
 import nose.tools as nt
 import argparse
 import os
+import shutil
+import tempfile
 
 
 def test_default_from_env():
@@ -106,3 +108,133 @@ def test_env_required():
         envrequired=True, default=11
     )])().parse_args()
     nt.assert_equal(ns, argparse.Namespace(opt3='13'))
+
+
+def test_env_snapshot():
+    env = at.EnvSnapshot(
+        {'SNAP_OPT1': '1', 'SNAP_OPT2': '2', 'OTHER': '3'}, prefix='snap_')
+    nt.assert_equal(dict(env), {'SNAP_OPT1': '1', 'SNAP_OPT2': '2'})
+
+    add_argument = at.add_argument_default_from_env_factory('snap_', env=env)
+    ns = at.build_arg_parser([
+        add_argument('--opt1'),
+        add_argument('--opt2', required=True),
+        add_argument('--opt3', default=3),
+    ])().parse_args([])
+    nt.assert_equal(ns, argparse.Namespace(opt1='1', opt2='2', opt3=3))
+
+    with nt.assert_raises(at.EnvironmentVarRequired):
+        at.build_arg_parser([add_argument('--opt3', envrequired=True)])()
+
+    # later changes to os.environ are not seen by a snapshot
+    os.environ['TEST_ENV_SNAPSHOT_OPT1'] = 'a'
+    try:
+        env = at.EnvSnapshot(prefix='test_env_snapshot_')
+        os.environ['TEST_ENV_SNAPSHOT_OPT1'] = 'b'
+        val = at.build_arg_parser([at.add_argument(
+            '--opt1', action=at.DefaultFromEnv, env=env,
+            env_prefix='test_env_snapshot_')])().parse_args([]).opt1
+        nt.assert_equal(val, 'a')
+    finally:
+        del os.environ['TEST_ENV_SNAPSHOT_OPT1']
+
+
+def test_env_coercion():
+    env = at.EnvSnapshot({
+        'INT': '3', 'INTS': '1, 2,3', 'EMPTY': '', 'CHOICE': 'b',
+        'FLAG': 'yes', 'NOFLAG': 'off', 'BADINT': 'x', 'BADCHOICE': 'c',
+        'PAIR': 'a:b',
+    })
+
+    def build(*args, **kwargs):
+        return at.build_arg_parser([at.add_argument(
+            *args, action=at.DefaultFromEnv, env=env, **kwargs)])()
+
+    nt.assert_equal(build('--int', type=int).get_default('int'), 3)
+    nt.assert_equal(
+        build('--ints', type=int, nargs='+').parse_args([]).ints, [1, 2, 3])
+    nt.assert_equal(build('--empty', nargs='*').get_default('empty'), [])
+    nt.assert_equal(
+        build('--choice', choices=['a', 'b']).get_default('choice'), 'b')
+    nt.assert_equal(
+        build('--pair', nargs=2, env_delimiter=':').get_default('pair'),
+        ['a', 'b'])
+
+    add_argument = at.add_argument_default_from_env_factory(env=env)
+    ns = at.build_arg_parser([
+        add_argument('--flag', action='store_true'),
+        add_argument('--noflag', action='store_false'),
+    ])().parse_args([])
+    nt.assert_equal(ns, argparse.Namespace(flag=True, noflag=False))
+    ns = at.build_arg_parser([
+        add_argument('--flag', action='store_false'),
+    ])().parse_args(['--flag'])
+    nt.assert_equal(ns, argparse.Namespace(flag=False))
+
+    # invalid env vars fail when the parser is built
+    for args, kwargs in [
+            (('--badint', ), dict(type=int)),
+            (('--badchoice', ), dict(choices=['a', 'b'])),
+            (('--empty', ), dict(nargs='+')),
+            (('--ints', ), dict(nargs=2)),
+            (('--int', ), dict(type=int, choices=[1, 2])),
+    ]:
+        with nt.assert_raises(at.EnvironmentVarInvalid):
+            build(*args, **kwargs)
+    with nt.assert_raises(at.EnvironmentVarInvalid):
+        at.build_arg_parser([add_argument('--badint', action='store_true')])
+
+
+def test_env_string_types_called_once():
+    env = at.EnvSnapshot({'X': 'a', 'XS': 'a,b'})
+    p = at.build_arg_parser([
+        at.add_argument('--x', action=at.DefaultFromEnv, env=env,
+                        type=lambda s: s + '!', choices=['a!']),
+        at.add_argument('--xs', action=at.DefaultFromEnv, env=env,
+                        type=lambda s: s + '!', nargs='+'),
+    ])()
+    ns = p.parse_args([])
+    nt.assert_equal(ns, argparse.Namespace(x='a!', xs=['a!', 'b!']))
+    nt.assert_equal(p.parse_args(['--x', 'a']).x, 'a!')
+
+
+def test_env_file_types_not_opened_when_built():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'out.txt')
+        other = os.path.join(tmpdir, 'other.txt')
+        with open(path, 'w') as fout:
+            fout.write('keep me')
+        env = at.EnvSnapshot({'OUT': path})
+        p = at.build_arg_parser([at.add_argument(
+            '--out', type=argparse.FileType('w'), action=at.DefaultFromEnv,
+            env=env)])()
+        # building the parser didn't truncate the file
+        with open(path) as fin:
+            nt.assert_equal(fin.read(), 'keep me')
+        nt.assert_equal(p.get_default('out'), path)
+
+        ns = p.parse_args(['--out', other])
+        ns.out.close()
+        with open(path) as fin:
+            nt.assert_equal(fin.read(), 'keep me')
+        # argparse opens the default when the option isn't given
+        ns = p.parse_args([])
+        ns.out.close()
+        nt.assert_equal(ns.out.name, path)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_env_file_types_with_nargs():
+    for nargs in ('+', '*', 2):
+        with nt.assert_raises(ValueError):
+            at.build_arg_parser([at.add_argument(
+                '--in', type=argparse.FileType('r'), nargs=nargs,
+                action=at.DefaultFromEnv, env={'IN': __file__})])()
+    # a single file is opened when parsing
+    ns = at.build_arg_parser([at.add_argument(
+        '--in', type=argparse.FileType('r'), nargs='?',
+        action=at.DefaultFromEnv, env={'IN': __file__})])().parse_args([])
+    getattr(ns, 'in').close()
+    nt.assert_equal(getattr(ns, 'in').name, __file__)
@@ -105,3 +105,23 @@ def test_doctest_env_vars():
     nt.assert_regexp_matches(rv, r"'fenv': '11'")
     nt.assert_regexp_matches(rv, r"'opt2': '2'")
     nt.assert_regexp_matches(rv, r"'another_setting': 5")
+
+
+def test_lazy_subparsers_example():
+    # subcommand modules are only imported when they are selected
+    cmd = (
+        'python -c "import sys;'
+        ' from argparse_tools.examples import lazy_subparsers_example as e;'
+        ' e.main(e.build_arg_parser().parse_args([\'runthat\']));'
+        ' print(\'imported runthis: %s\' %'
+        ' (\'argparse_tools.examples.runthis\' in sys.modules))"')
+    rv = str(check_output(cmd, shell=True))
+    nt.assert_regexp_matches(rv, r'hello world from runthat!')
+    nt.assert_regexp_matches(rv, r"'custom_arg': 99999")
+    nt.assert_regexp_matches(rv, r'imported runthis: False')
+
+    cmd = ('python -m argparse_tools.examples.lazy_subparsers_example'
+           ' runthis --opt2 2')
+    rv = str(check_output(cmd, shell=True))
+    nt.assert_regexp_matches(rv, r'hello world from runthis!')
+    nt.assert_regexp_matches(rv, r"'opt2': '2'")
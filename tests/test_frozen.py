@@ -0,0 +1,105 @@
+import argparse_tools as at
+from argparse_tools.batch import parse_many
+from argparse_tools.dispatcher import Dispatcher
+import argparse
+import pickle
+import sys
+import nose.tools as nt
+
+FUNCS = [
+    at.add_argument('--a', type=int, default=1),
+    at.add_argument('--b', nargs='*', default=[]),
+    at.add_argument('--count'),
+]
+
+
+def test_frozen_results():
+    p = at.build_arg_parser(FUNCS, frozen=True)()
+    ns = p.parse_args(['--a', '2', '--b', 'x', 'y'])
+    nt.assert_is_instance(ns, at.FrozenNamespace)
+    nt.assert_equal((ns.a, ns.b, ns.count), (2, ['x', 'y'], None))
+    nt.assert_in('a', ns)
+    nt.assert_not_in(2, ns)
+    nt.assert_equal(ns._asdict(), {'a': 2, 'b': ['x', 'y'], 'count': None})
+    nt.assert_equal(repr(ns), "FrozenNamespace(a=2, b=['x', 'y'], count=None)")
+    with nt.assert_raises(AttributeError):
+        ns.a = 3
+    with nt.assert_raises(AttributeError):
+        ns.c = 3
+
+    expected = argparse.Namespace(a=2, b=['x', 'y'], count=None)
+    nt.assert_equal(ns, expected)
+    nt.assert_equal(expected, ns)
+    nt.assert_not_equal(ns, argparse.Namespace(a=2))
+    nt.assert_not_equal(ns, (2, ['x', 'y'], None))
+    nt.assert_not_equal((2, ['x', 'y'], None), ns)
+
+    # same dests share one class, and equal results dedupe
+    ns2 = p.parse_args(['--b', 'x', 'y', '--a', '2'])
+    nt.assert_is(type(ns), type(ns2))
+    nt.assert_equal(len(set([ns, ns2, p.parse_args([])])), 2)
+    nt.assert_equal(pickle.loads(pickle.dumps(ns)), ns)
+    nt.assert_less(sys.getsizeof(ns), sys.getsizeof(vars(expected)))
+
+
+def test_frozen_subparsers():
+    p = at.build_arg_parser([
+        at.add_argument('--a', default=1),
+        at.add_subparsers({
+            'sub1': [at.add_argument('--b', default=2)],
+            'sub2': [at.add_argument('--c', default=3)],
+        }),
+    ], frozen=True, raise_errors=True)()
+    ns = p.parse_args(['sub1', '--b', '4'])
+    nt.assert_equal(ns, argparse.Namespace(a=1, b='4'))
+    nt.assert_equal(ns, at.freeze(argparse.Namespace(b='4', a=1)))
+    nt.assert_equal(hash(ns), hash(at.freeze(argparse.Namespace(b='4', a=1))))
+    nt.assert_equal(p.parse_args(['sub2']).c, 3)
+
+    with nt.assert_raises(at.ParseError):
+        p.parse_args(['sub1', '--c', '1'])
+
+    results = list(parse_many(p, [['sub1'], ['sub2'], ['sub3']]))
+    nt.assert_equal(results[:2], [
+        argparse.Namespace(a=1, b=2), argparse.Namespace(a=1, c=3)])
+    nt.assert_is_instance(results[0], at.FrozenNamespace)
+    nt.assert_is_instance(results[2], at.ParseError)
+
+    dispatcher = Dispatcher(
+        [at.add_subparsers({'sub1': [at.add_argument('--b')]})],
+        handlers={'sub1': lambda ns: ns}, frozen=True)
+    ns = dispatcher(['sub1', '--b', '1'])
+    nt.assert_is_instance(ns, at.FrozenNamespace)
+    nt.assert_equal(ns._asdict(), {'b': '1'})
+
+
+def test_frozen_isnt_a_plain_tuple():
+    p = at.build_arg_parser([], frozen=True)()
+    ns = p.parse_args([])
+    nt.assert_equal(ns, argparse.Namespace())
+    nt.assert_true(ns)
+
+    ns = at.build_arg_parser(FUNCS, frozen=True)().parse_args([])
+    for other in (ns, (), (1, [], None)):
+        with nt.assert_raises(TypeError):
+            ns < other
+        with nt.assert_raises(TypeError):
+            ns <= other
+        with nt.assert_raises(TypeError):
+            other > ns
+        with nt.assert_raises(TypeError):
+            other >= ns
+    with nt.assert_raises(TypeError):
+        sorted([ns, ns])
+
+    # values that can't be made hashable make the namespace unhashable
+    hash(at.freeze(argparse.Namespace(a=[1, {'b': {2}}])))
+    for value in (bytearray(b'x'), [bytearray(b'x')]):
+        with nt.assert_raises(TypeError):
+            hash(at.freeze(argparse.Namespace(a=value)))
+
+
+def test_frozen_requires_our_parser():
+    with nt.assert_raises(ValueError):
+        at.build_arg_parser(
+            FUNCS, parser=argparse.ArgumentParser(), frozen=True)
@@ -0,0 +1,48 @@
+import argparse
+import argparse_tools as at
+import nose.tools as nt
+
+
+class _CountingParser(at.ArgumentParser):
+    renders = 0
+
+    def _get_formatter(self):
+        _CountingParser.renders += 1
+        return super(_CountingParser, self)._get_formatter()
+
+
+def test_help_is_cached():
+    p = at.build_arg_parser([at.add_argument('--a')],
+                            parser=_CountingParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter))()
+    _CountingParser.renders = 0
+    text = p.format_help()
+    nt.assert_equal(p.format_help(), text)
+    p.format_usage()
+    p.format_usage()
+    nt.assert_equal(_CountingParser.renders, 2)
+
+    # adding arguments, groups and defaults invalidates the cache
+    at.group('grp', at.add_argument('--b', default=1, help='b'))(p)
+    nt.assert_in('--b B', p.format_help())
+    p.set_defaults(b=2)
+    nt.assert_in('(default: 2)', p.format_help())
+    at.add_subparsers({'sub1': []})(p)
+    nt.assert_in('{sub1}', p.format_help())
+    p._subparsers._group_actions[0].add_parser('sub2')
+    nt.assert_in('{sub1,sub2}', p.format_usage())
+
+
+def test_prerender():
+    p = at.build_arg_parser([
+        at.add_argument('--a'),
+        at.add_subparsers({'sub1': [
+            at.add_argument('--b'),
+            at.add_subparsers({'sub2': []}, lazy=True)]}),
+    ], parser=_CountingParser(), prerender=True)()
+    sub1 = p._subparsers._group_actions[0].choices['sub1']
+    nt.assert_in('help', sub1._help_cache)
+    nt.assert_in('help', p._help_cache)
+    # lazy subparsers are not built just to prerender them
+    lazy = sub1._subparsers._group_actions[0].choices
+    nt.assert_in('sub2', lazy._pending)
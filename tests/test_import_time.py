@@ -0,0 +1,71 @@
+import argparse_tools as at
+import os
+import subprocess
+import sys
+import tempfile
+import nose.tools as nt
+
+# modules that importing argparse_tools, or a small cli built with it, should
+# never import
+HEAVY_MODULES = [
+    'argparse_tools.batch', 'argparse_tools.cache', 'argparse_tools.client',
+    'argparse_tools.completion', 'argparse_tools.config',
+    'argparse_tools.dispatcher', 'argparse_tools.instrument',
+    'argparse_tools.partial', 'argparse_tools.server',
+    'argparse_tools.validate', 'multiprocessing', 'inspect',
+    'tempfile', 'pickle', 'hashlib', 'json', 'yaml', 'configparser', 'shlex',
+    'socket',
+]
+# microseconds.  generous, so that slow machines don't fail the test
+SELF_TIME_BUDGET = 20000
+
+
+def _importtime(module, pycache):
+    """Return {module: self time in us} for the modules imported by
+    `import module` in a new interpreter"""
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPYCACHEPREFIX'] = pycache
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(at.__file__))
+    out = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.STDOUT, env=env).decode()
+    rv = {}
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        rv[name.strip()] = int(self_us)
+    return rv
+
+
+def _check_import(module, heavy_modules=HEAVY_MODULES):
+    pycache = tempfile.mkdtemp()
+    _importtime(module, pycache)  # write the bytecode cache
+    times = [_importtime(module, pycache) for _ in range(3)]
+    nt.assert_in('argparse_tools', times[0])
+    for name in heavy_modules:
+        nt.assert_not_in(name, times[0], "importing %s imported %s" % (
+            module, name))
+    nt.assert_less(
+        min(t['argparse_tools'] for t in times), SELF_TIME_BUDGET)
+
+
+def test_import_time():
+    _check_import('argparse_tools', HEAVY_MODULES + ['shutil'])
+
+
+def test_example_import_time():
+    # argparse imports shutil as soon as an argument is added to a parser
+    _check_import('argparse_tools.examples.runthis')
+
+
+def test_lazy_attributes():
+    from argparse_tools.batch import parse_many
+    from argparse_tools.dispatcher import Dispatcher
+    nt.assert_is(at.parse_many, parse_many)
+    nt.assert_is(at.Dispatcher, Dispatcher)
+    nt.assert_is(at.validate.check_conflicts, at.check_conflicts)
+    nt.assert_in('LayeredDefaults', dir(at))
+    with nt.assert_raises(AttributeError):
+        at.no_such_attribute
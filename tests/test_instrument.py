@@ -0,0 +1,49 @@
+import argparse_tools as at
+from argparse_tools.instrument import Instrumentation
+import json
+import nose.tools as nt
+
+
+def test_instrumentation():
+    seen = []
+    funcs = [
+        at.add_argument('--a'),
+        at.group('my group', at.add_argument('--b')),
+        at.add_argument('--c', action=at.DefaultFromEnv,
+                        env={'C': '1'}),
+        at.add_subparsers({'sub1': [at.add_argument('--d')]}),
+    ]
+    with Instrumentation(callback=seen.append) as report:
+        p = at.build_arg_parser(funcs)()
+        p.parse_args(['sub1', '--d', '1'])
+        p.format_help()
+        p.format_help()
+    nt.assert_is(at._instrumentation, None)
+    nt.assert_equal(seen, report.records)
+
+    paths = [(r['kind'], r['path']) for r in report.records]
+    for expected in [
+            ('build', "add_argument('--a')"),
+            ('build', "group('my group')/add_argument('--b')"),
+            ('env', "add_argument('--c')/C"),
+            ('subparser', "add_subparsers(['sub1'])/sub1"),
+            ('build', "add_subparsers(['sub1'])/sub1/add_argument('--d')"),
+            ('parse', p.prog),
+            ('help', p.prog),
+    ]:
+        nt.assert_in(expected, paths)
+    # the help is only rendered once, and the subparser's parse is nested
+    nt.assert_equal(len([k for k, _ in paths if k == 'help']), 1)
+    nt.assert_equal(len([k for k, _ in paths if k == 'parse']), 2)
+
+    summary = report.summary()
+    nt.assert_equal(
+        sorted(summary, key=lambda t: -t['seconds']), summary)
+    rv = json.loads(report.to_json())
+    nt.assert_equal(len(rv['records']), len(report.records))
+    for rec in rv['records']:
+        nt.assert_greater_equal(rec['seconds'], 0)
+
+    # nothing is recorded outside the with block
+    at.build_arg_parser(funcs)
+    nt.assert_equal(len(seen), len(report.records))
@@ -0,0 +1,57 @@
+import argparse_tools as at
+import argparse
+import nose.tools as nt
+
+FUNCS = [
+    at.add_argument('--verbose', action='store_true'),
+    at.add_argument('--version-file'),
+    at.add_argument('--value', type=int),
+    at.group('g', at.add_argument('--values', nargs='*'),
+             at.add_argument('-n', '--num', type=int)),
+    at.add_argument('-x', action='store_true'),
+    at.add_argument('-xyz'),
+    at.add_argument('rest', nargs='*'),
+]
+
+ARGVS = [
+    ['--verb'], ['--vers', 'a'], ['--vers=a'], ['--val', '1'], ['--va', '1'],
+    ['--value=3'], ['--values', 'a', 'b'], ['-n5'], ['-n', '5'], ['--nu=5'],
+    ['-x'], ['-xy', '1'], ['-xyz=1'], ['--unknown'], ['-5'], ['--v=1'],
+    ['a', '--verbose', 'b'], ['--', '--verb'],
+]
+
+
+def _parse(parser, argv):
+    try:
+        return parser.parse_args(argv)
+    except at.ParseError as err:
+        return err.message
+
+
+def test_option_index_matches_argparse():
+    ours = at.build_arg_parser(FUNCS, raise_errors=True)()
+    theirs = at.build_arg_parser(FUNCS, parser=at.NonExitingArgumentParser(
+        exit_on_error=False))()
+    # the plain argparse implementation, for comparison
+    theirs._get_option_tuples = lambda option_string: \
+        argparse.ArgumentParser._get_option_tuples(theirs, option_string)
+    for argv in ARGVS:
+        nt.assert_equal(_parse(ours, argv), _parse(theirs, argv))
+    nt.assert_equal(
+        _parse(ours, ['--va', '1']),
+        'ambiguous option: --va could match --value, --values')
+
+
+def test_option_index_is_updated():
+    p = at.build_arg_parser([at.add_argument('--alpha')])()
+    nt.assert_equal(p.parse_args(['--alp', '1']).alpha, '1')
+    p.add_argument_group('late').add_argument('--alpine')
+    nt.assert_equal(p.parse_args(['--alpi', '2']).alpine, '2')
+    with nt.assert_raises(SystemExit):
+        p.parse_args(['--alp', '1'])
+
+    p = at.build_arg_parser(
+        [at.add_argument('-a', '--apple'), at.add_argument('-a', '--avocado')],
+        conflict_handler='resolve')()
+    nt.assert_equal(vars(p.parse_args(['--app', '1', '-a', '2'])),
+                    {'apple': '1', 'avocado': '2'})
@@ -0,0 +1,103 @@
+import argparse_tools as at
+from argparse import Namespace
+import nose.tools as nt
+
+FUNCS = [
+    at.add_argument('--a', type=int, default=1),
+    at.add_argument('--b', nargs='*'),
+    at.add_subparsers({'sub1': [at.add_argument('--c')], 'sub2': []}),
+]
+
+
+def test_parse_cache():
+    p = at.build_arg_parser(FUNCS, parse_cache_size=2)()
+    ns = p.parse_args(['--a', '2', 'sub1', '--c', 'x'])
+    nt.assert_is_instance(ns, at.FrozenNamespace)
+    nt.assert_equal(ns, Namespace(a=2, b=None, c='x'))
+    nt.assert_equal(p.parse_cache_info(), (0, 1, 2, 1))
+
+    # hits return the same immutable result
+    nt.assert_is(p.parse_args(['--a', '2', 'sub1', '--c', 'x']), ns)
+    nt.assert_equal(p.parse_cache_info(), (1, 1, 2, 1))
+
+    # results with mutable values are copied
+    ns = p.parse_args(['--b', 'y', '--a', '1', 'sub2'])
+    ns.b.append('z')
+    nt.assert_equal(p.parse_args(['--b', 'y', '--a', '1', 'sub2']).b, ['y'])
+    nt.assert_equal(p.parse_cache_info(), (2, 2, 2, 2))
+
+    # least recently used results are evicted
+    p.parse_args(['sub2'])
+    nt.assert_equal(p.parse_cache_info(), (2, 3, 2, 2))
+    p.parse_args(['--a', '2', 'sub1', '--c', 'x'])
+    nt.assert_equal(p.parse_cache_info().misses, 4)
+
+    # errors aren't cached
+    for _ in range(2):
+        with nt.assert_raises(SystemExit):
+            p.parse_args(['sub3'])
+    nt.assert_equal(p.parse_cache_info(), (2, 4, 2, 2))
+
+    p.clear_parse_cache()
+    nt.assert_equal(p.parse_cache_info(), (0, 0, 2, 0))
+
+
+def test_parse_cache_invalidation():
+    p = at.build_arg_parser(FUNCS[:2], parse_cache_size=10,
+                            raise_errors=True)()
+    nt.assert_equal(p.parse_args([]).a, 1)
+    p.set_defaults(a=3)
+    nt.assert_equal(p.parse_args([]).a, 3)
+    p.add_argument('--d', default=4)
+    nt.assert_equal(p.parse_args([]).d, 4)
+    nt.assert_equal(p.parse_cache_info().misses, 3)
+    with nt.assert_raises(at.ParseError):
+        p.parse_args(['--unknown'])
+    # a namespace bypasses the cache
+    nt.assert_equal(p.parse_args([], Namespace(e=5)).e, 5)
+    nt.assert_equal(p.parse_cache_info().misses, 3)
+
+
+def test_parse_cache_dispatcher():
+    from argparse_tools.dispatcher import Dispatcher
+    dispatcher = Dispatcher(FUNCS, handlers={'sub1': lambda ns: ns},
+                            parse_cache_size=10)
+    for _ in range(2):
+        ns = dispatcher(['sub1', '--c', 'x'])
+        nt.assert_equal(ns, Namespace(a=1, b=None, c='x'))
+        nt.assert_is_instance(ns, at.FrozenNamespace)
+    nt.assert_equal(dispatcher.parser.parse_cache_info().hits, 1)
+
+
+def test_parse_cache_uncopyable_results():
+    import argparse
+    p = at.build_arg_parser([
+        at.add_argument('--f', nargs='*', type=argparse.FileType('r')),
+    ], parse_cache_size=10)()
+    for _ in range(2):
+        ns = p.parse_args(['--f', __file__])
+        nt.assert_equal(ns.f[0].name, __file__)
+        ns.f[0].close()
+    nt.assert_equal(p.parse_cache_info(), (0, 2, 10, 0))
+
+
+def test_parse_cache_fromfile():
+    import os
+    import shutil
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'args.txt')
+        p = at.build_arg_parser(
+            FUNCS[:2], parse_cache_size=10, fromfile_prefix_chars='@')()
+        for a in ('2', '3'):
+            with open(path, 'w') as fout:
+                fout.write('--a\n%s\n' % a)
+            nt.assert_equal(p.parse_args(['@' + path]).a, int(a))
+        nt.assert_equal(p.parse_cache_info().currsize, 0)
+        # other command-lines are still cached
+        p.parse_args(['--a', '4'])
+        nt.assert_equal(p.parse_args(['--a', '4']).a, 4)
+        nt.assert_equal(p.parse_cache_info().hits, 1)
+    finally:
+        shutil.rmtree(tmpdir)
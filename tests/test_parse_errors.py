@@ -0,0 +1,46 @@
+import argparse_tools as at
+from argparse import Namespace
+import nose.tools as nt
+
+
+def _parser():
+    return at.build_arg_parser([
+        at.add_argument('--a', type=int),
+        at.mutually_exclusive(
+            at.add_argument('--b', action='store_true'),
+            at.add_argument('--c', action='store_true')),
+        at.add_subparsers({
+            'sub1': [at.add_argument('--in_1', required=True)],
+            'sub2': [at.add_argument('--in_2', type=float)]}),
+    ], raise_errors=True)()
+
+
+def test_raise_errors():
+    p = _parser()
+    nt.assert_is_instance(p, at.NonExitingArgumentParser)
+    nt.assert_equal(
+        p.parse_args(['--a', '1', 'sub1', '--in_1', 'x']),
+        Namespace(a=1, b=False, c=False, in_1='x'))
+
+    def _error(argv):
+        try:
+            p.parse_args(argv)
+        except at.ParseError as err:
+            return err.argument, err.message
+        raise AssertionError("no ParseError for %s" % argv)
+
+    nt.assert_equal(
+        _error(['--a', 'x', 'sub2']),
+        ('--a', "invalid int value: 'x'"))
+    nt.assert_equal(
+        _error(['--b', '--c', 'sub2']),
+        ('--c', 'not allowed with argument --b'))
+    nt.assert_equal(
+        _error(['sub2', '--in_2', 'x']),
+        ('--in_2', "invalid float value: 'x'"))
+    nt.assert_equal(_error(['sub2', '--in_2', '1', '--d', '1']),
+                    ('--d', 'unrecognized arguments: --d 1'))
+    nt.assert_equal(
+        _error(['sub1']),
+        (None, 'the following arguments are required: --in_1'))
+    nt.assert_equal(_error(['sub3'])[0], '{sub1,sub2}')
@@ -0,0 +1,87 @@
+import argparse_tools as at
+from argparse_tools.partial import parse_partial
+import nose.tools as nt
+
+
+def expensive(parser):
+    raise AssertionError("subcommands shouldn't be built")
+
+
+def add_log_level(parser):
+    parser.add_argument('--log-level', default='INFO')
+
+
+def add_tools(parser):
+    parser.add_subparsers().add_parser('tools').add_argument('--workers')
+
+
+FUNCS = [
+    at.add_argument('--config', required=True),
+    at.group('logging', add_log_level),
+    at.add_argument('--workers', type=int, default=1),
+    at.add_argument('--version', action='version', version='1.2'),
+    at.add_subparsers({
+        'train': [expensive],
+        'predict': 'argparse_tools.examples.not_a_module',
+    }),
+]
+
+
+def test_parse_partial():
+    ns, rest = parse_partial(FUNCS + [add_tools], ['config', 'log_level'], [
+        '--workers', '3', '--config', 'a.ini', '--log-level', 'DEBUG',
+        'train', '--config', 'b.ini', '-h'])
+    nt.assert_equal(vars(ns), {'config': 'a.ini', 'log_level': 'DEBUG'})
+    nt.assert_equal(
+        rest, ['--workers', '3', 'train', '--config', 'b.ini', '-h'])
+
+    # options aren't required, and abbreviations are left alone
+    ns, rest = parse_partial(
+        at.build_arg_parser(FUNCS[:-1]), ['config'], ['--conf', 'b.ini'])
+    nt.assert_equal(vars(ns), {'config': None})
+    nt.assert_equal(rest, ['--conf', 'b.ini'])
+
+
+def test_parse_partial_stops_at_subcommand():
+    funcs = [
+        at.add_argument('--config'),
+        at.add_argument('--tags', nargs='*'),
+        at.add_argument('-v', action='store_true'),
+        at.add_subparsers({
+            'run': [at.add_argument('--config', dest='run_config')]}),
+    ]
+    parser = at.build_arg_parser(funcs)()
+    argv = ['run', '--config', 'sub.ini']
+    ns = parser.parse_args(argv)
+    nt.assert_equal((ns.config, ns.run_config), (None, 'sub.ini'))
+    ns, rest = parse_partial(funcs, ['config'], argv)
+    nt.assert_equal(vars(ns), {'config': None})
+    nt.assert_equal(rest, argv)
+
+    # values of options are skipped, up to the first positional or "--"
+    for argv, config in [
+            (['-v', '--tags', 'a', 'b', '--config', 'x.ini', 'run'], 'x.ini'),
+            (['--tags', 'a', 'run', '--config', 'x.ini'], 'x.ini'),
+            (['--tags=a', 'run', '--config', 'x.ini'], None),
+            (['-v', 'run', '--config', 'x.ini'], None),
+            (['--', '--config', 'x.ini'], None)]:
+        ns, rest = parse_partial(funcs, ['config'], argv)
+        nt.assert_equal(ns.config, config, argv)
+
+
+def test_parse_partial_version():
+    with nt.assert_raises(SystemExit):
+        parse_partial(FUNCS, ['version'], ['--version'])
+    # a subcommand's --version isn't the parser's
+    ns, rest = parse_partial(FUNCS, ['version'], ['train', '--version'])
+    nt.assert_equal(rest, ['train', '--version'])
+
+
+def test_parse_partial_errors():
+    with nt.assert_raises(ValueError):
+        parse_partial(FUNCS, ['config', 'not_an_option'], [])
+    with nt.assert_raises(ValueError):
+        parse_partial([at.add_argument('pos')], ['pos'], [])
+    with nt.assert_raises(at.ParseError):
+        parse_partial(FUNCS, ['workers'], ['--workers', 'x'],
+                      raise_errors=True)
@@ -0,0 +1,92 @@
+import argparse_tools as at
+from argparse_tools import client, server
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import nose.tools as nt
+
+TARGET = 'argparse_tools.examples.runthis:build_arg_parser'
+
+
+class TestServer(object):
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'cli.sock')
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(at.__file__)))
+        env.pop('MYVAR_FENV', None)
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'argparse_tools.server', TARGET,
+             self.socket_path, '--prog', 'runthis'], env=env)
+        for _ in range(500):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.01)
+
+    setup_method = setup
+
+    def teardown(self):
+        self.proc.terminate()
+        self.proc.wait()
+        nt.assert_false(os.path.exists(self.socket_path))
+        shutil.rmtree(self.tmpdir)
+
+    teardown_method = teardown
+
+    def _call(self, argv, **kwargs):
+        kwargs.setdefault('env', {})
+        return subprocess.run(
+            [sys.executable, '-S', client.__file__, self.socket_path] + argv,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, **kwargs)
+
+    def test_call(self):
+        rv = self._call(['--opt2', 'x'])
+        nt.assert_equal(rv.returncode, 0, rv.stderr)
+        nt.assert_in('hello world from runthis!', rv.stdout)
+        nt.assert_in("'opt2': 'x'", rv.stdout)
+        nt.assert_in("'fenv': None", rv.stdout)
+
+        rv = self._call(['--not_an_option'])
+        nt.assert_equal(rv.returncode, 2)
+        nt.assert_equal(rv.stdout, '')
+        nt.assert_in('usage: runthis', rv.stderr)
+        nt.assert_in('the following arguments are required: --opt2',
+                     rv.stderr)
+
+    def test_env_and_cwd(self):
+        # the default of --fenv comes from the caller's env, not the server's
+        rv = self._call(['--opt2', 'x'], env={'MYVAR_FENV': 'fromenv'})
+        nt.assert_equal(rv.returncode, 0, rv.stderr)
+        nt.assert_in("'fenv': 'fromenv'", rv.stdout)
+
+        read, write = os.pipe()
+        try:
+            code = client.call(
+                self.socket_path, ['--opt2', 'y'], env={}, cwd=self.tmpdir,
+                stdio=(0, write, 2))
+            os.close(write)
+            with os.fdopen(read) as fin:
+                out = fin.read()
+        finally:
+            for fd in (read, write):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        nt.assert_equal(code, 0)
+        nt.assert_in("'opt2': 'y'", out)
+
+
+def test_request_encoding():
+    argv = ['a', '', 'b=c', 'é']
+    env = {'A': '1', 'B': 'x=y', 'C': ''}
+    nt.assert_equal(
+        server.decode_request(client.encode_request(argv, env, '/tmp')),
+        (argv, env, '/tmp'))
+    nt.assert_equal(
+        server.decode_request(client.encode_request([], {}, '/')),
+        ([], {}, '/'))
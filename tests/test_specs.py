@@ -0,0 +1,80 @@
+import argparse
+import argparse_tools as at
+from argparse_tools.examples import shared
+import nose.tools as nt
+
+
+def test_specs_are_comparable():
+    nt.assert_equal(at.add_argument('--a', choices=[1, 2]),
+                    at.add_argument('--a', choices=[1, 2]))
+    nt.assert_not_equal(at.add_argument('--a'), at.add_argument('--b'))
+    nt.assert_equal(
+        len(set([at.add_argument('--a', choices=[1, 2]),
+                 at.add_argument('--a', choices=[1, 2]),
+                 at.group('g', at.add_argument('--b')),
+                 at.group('g', at.add_argument('--b')),
+                 at.mutually_exclusive(at.add_argument('--b'))])),
+        3)
+    nt.assert_equal(
+        at.add_subparsers({'a': [at.add_argument('--b')]}),
+        at.add_subparsers({'a': [at.add_argument('--b')]}))
+    nt.assert_not_equal(
+        at.add_subparsers({'a': [at.add_argument('--b')]}),
+        at.add_subparsers({'a': [at.add_argument('--b')]}, lazy=True))
+
+    # values of different types render and parse differently
+    specs = [at.add_argument('--a', default=1),
+             at.add_argument('--a', default=True),
+             at.add_argument('--a', default=1.0),
+             at.add_argument('--a', default=[1]),
+             at.add_argument('--a', default=(1, )),
+             at.group('g', at.add_argument('--a', default=1)),
+             at.group('g', at.add_argument('--a', default=True))]
+    nt.assert_equal(len(set(specs)), len(specs))
+    nt.assert_equal(len(set(hash(spec) for spec in specs)), len(specs))
+
+
+def test_spec_is_abstract():
+    with nt.assert_raises(TypeError):
+        at.Spec()
+
+
+def test_spec_introspection():
+    spec = at.group(
+        'g',
+        at.add_argument('-x', '--some-opt'),
+        at.mutually_exclusive(
+            at.add_argument('-y'), at.add_argument('pos')),
+        shared.opt1)
+    nt.assert_equal(
+        [s.dest for s in spec.walk() if isinstance(s, at.ArgumentSpec)],
+        ['some_opt', 'y', 'pos'])
+    nt.assert_equal(spec.children[-1], shared.opt1)
+    nt.assert_equal(spec.as_dict()['funcs'][1], {
+        'type': 'group', 'description': None,
+        'kwargs': {'mutually_exclusive': True},
+        'funcs': [
+            {'type': 'add_argument', 'args': ['-y'], 'kwargs': {}},
+            {'type': 'add_argument', 'args': ['pos'], 'kwargs': {}}]})
+    nt.assert_equal(
+        repr(at.add_argument('--a', default=1)),
+        "add_argument('--a', default=1)")
+
+    subparsers = at.add_subparsers({
+        'a': [at.add_argument('--in_a')],
+        'b': 'argparse_tools.examples.runthat:build_arg_parser'})
+    nt.assert_equal(
+        [s.dest for s in subparsers.walk()
+         if isinstance(s, at.ArgumentSpec)],
+        ['in_a'])
+
+
+def test_specs_can_be_reused():
+    spec = at.mutually_exclusive(
+        at.add_argument('--a', action='store_true'),
+        at.add_argument('--b', action='store_true'))
+    for _ in range(2):
+        p = argparse.ArgumentParser()
+        spec(p)
+        with nt.assert_raises(SystemExit):
+            p.parse_args(['--a', '--b'])
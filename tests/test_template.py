@@ -0,0 +1,108 @@
+import argparse_tools as at
+from argparse import Namespace
+import nose.tools as nt
+
+
+def opt1(parser):
+    parser.add_argument('--shared_option1', default=12345)
+
+
+def _common():
+    return at.template(
+        opt1,
+        at.group('common', at.add_argument('--a', type=int, default=1),
+                 at.mutually_exclusive(
+                     at.add_argument('--x', action='store_true'),
+                     at.add_argument('--y', action='store_true'))),
+        at.add_argument('--opt2', default='o'),
+    )
+
+
+def _subparser(p, name):
+    return p._subparsers._group_actions[0].choices[name]
+
+
+def test_template_shares_actions():
+    common = _common()
+    p = at.build_arg_parser([
+        at.add_subparsers(dict(
+            ('sub%s' % i, [common, at.add_argument('--in_%s' % i)])
+            for i in range(3))),
+    ])()
+    subs = [_subparser(p, 'sub%s' % i) for i in range(3)]
+    actions = [dict((a.dest, a) for a in sub._actions) for sub in subs]
+    for dest in ['shared_option1', 'a', 'x', 'y', 'opt2']:
+        nt.assert_is(actions[0][dest], actions[1][dest])
+        nt.assert_is(actions[0][dest], actions[2][dest])
+    nt.assert_is_not(actions[0]['help'], actions[1]['help'])
+
+    nt.assert_equal(
+        p.parse_args(['sub1', '--a', '2', '--x', '--in_1', 'i']),
+        Namespace(shared_option1=12345, a=2, x=True, y=False, opt2='o',
+                  in_1='i'))
+    nt.assert_in('common:', subs[0].format_help())
+    with nt.assert_raises(SystemExit):
+        p.parse_args(['sub0', '--x', '--y'])
+
+    # the same as building the options for each parser
+    p2 = at.build_arg_parser(
+        common.funcs + (at.add_argument('--in_0'), ), prog=subs[0].prog)()
+    nt.assert_equal(subs[0].format_help(), p2.format_help())
+
+
+def test_template_copy_on_write():
+    common = _common()
+    p1 = at.build_arg_parser([common])()
+    p2 = at.build_arg_parser([common])()
+    p1.set_defaults(a=5, other=1)
+    nt.assert_equal(p1.parse_args([]).a, 5)
+    nt.assert_equal(p2.parse_args([]).a, 1)
+    nt.assert_is(p1._option_string_actions['--a'], p1._actions[2])
+
+    # conflicting options are removed from a copy, not the shared action
+    p3 = at.build_arg_parser(
+        [common, at.add_argument('--opt2', type=int, default=3)],
+        conflict_handler='resolve')()
+    nt.assert_equal(p3.parse_args([]).opt2, 3)
+    nt.assert_equal(p2.parse_args(['--opt2', 'z']).opt2, 'z')
+    nt.assert_equal(p2._option_string_actions['--opt2'].option_strings,
+                    ['--opt2'])
+
+
+def test_template_override():
+    common = _common()
+    required = common.override('opt2', required=True, default=None)
+    p1 = at.build_arg_parser([required])()
+    p2 = at.build_arg_parser([common])()
+    p3 = at.build_arg_parser([required])()
+    with nt.assert_raises(SystemExit):
+        p1.parse_args([])
+    nt.assert_equal(p2.parse_args([]).opt2, 'o')
+    nt.assert_equal(p3.parse_args(['--opt2', 'b']).opt2, 'b')
+    nt.assert_is(p1._option_string_actions['--opt2'],
+                 p3._option_string_actions['--opt2'])
+    nt.assert_is_not(p1._option_string_actions['--opt2'],
+                     p2._option_string_actions['--opt2'])
+    nt.assert_is(p1._option_string_actions['--a'],
+                 p2._option_string_actions['--a'])
+    nt.assert_equal(repr(at.template(at.add_argument('--b')).override(
+        'b', default=2)), "template(add_argument('--b')).override('b', "
+                          "default=2)")
+
+    with nt.assert_raises(ValueError):
+        common.override('not_an_option', default=1)
+    with nt.assert_raises(ValueError):
+        at.build_arg_parser([at.template(at.add_subparsers({'a': []}))])
+
+    # inside a group, the funcs are applied directly
+    p4 = at.build_arg_parser([at.group('g', at.template(
+        at.add_argument('--b')).override('b', required=True))])()
+    with nt.assert_raises(SystemExit):
+        p4.parse_args([])
+
+
+def test_template_find_conflicts():
+    from argparse_tools.validate import find_conflicts
+    conflicts = find_conflicts([_common(), at.add_argument('--a')])
+    nt.assert_equal([(c.kind, c.key) for c in conflicts],
+                    [('option', '--a'), ('dest', 'a')])
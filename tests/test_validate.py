@@ -0,0 +1,61 @@
+import argparse_tools as at
+from argparse_tools.examples import shared
+from argparse_tools import validate
+import nose.tools as nt
+
+
+def test_no_conflicts():
+    from argparse_tools.examples import runthis, runthat
+    for module in (runthis, runthat):
+        nt.assert_equal(validate.find_conflicts(module.build_arg_parser.funcs),
+                        [])
+
+
+def test_find_conflicts():
+    def opaque(parser):
+        parser.add_argument('--shared_option1', '-s')
+        at.group('g', at.add_argument('--x-y'))(parser)
+
+    funcs = [
+        shared.opt1,
+        shared.opt2,
+        opaque,
+        at.add_argument('--x_y'),
+        at.add_argument('--verbose', action='store_true'),
+        at.add_argument('--quiet', action='store_false', dest='verbose'),
+        at.add_argument('--fenv', action=at.DefaultFromEnv,
+                        env_prefix='my_'),
+        at.add_subparsers({
+            'sub1': [
+                shared.opt2(required=True),
+                at.mutually_exclusive(
+                    at.add_argument('-h', action='store_true'),
+                    at.add_argument('--other')),
+                at.add_argument('--env', action=at.DefaultFromEnv,
+                                env_prefix='my_f')],
+            'sub2': [at.add_argument('--fenv', action=at.DefaultFromEnv,
+                                     env_prefix='my_')],
+            'sub3': 'some.module:funcs',
+        }, lazy=True),
+    ]
+    conflicts = validate.find_conflicts(funcs, prog='cli')
+    nt.assert_equal(
+        sorted((c.kind, c.key) for c in conflicts),
+        sorted([
+            ('option', '--shared_option1'),
+            ('dest', 'shared_option1'),
+            ('option', '-h'),
+            ('dest', 'x_y'),
+            ('shadowed dest', 'opt2'),
+            ('shadowed dest', 'fenv'),
+            ('env', 'MY_FENV'),
+        ]))
+    by_key = dict((c.key, c) for c in conflicts)
+    nt.assert_equal(by_key['-h'].locations, [
+        'cli sub1: help', "cli sub1: add_argument('-h', action='store_true')"])
+    nt.assert_equal(len(by_key['MY_FENV'].locations), 2)
+
+    with nt.assert_raises(validate.SpecConflictError) as cm:
+        validate.check_conflicts(funcs)
+    nt.assert_equal(len(cm.exception.conflicts), 7)
+    nt.assert_in('Found 7 conflicts', str(cm.exception))